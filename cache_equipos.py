@@ -0,0 +1,144 @@
+# Caché en disco de las bases de equipos ya importadas y normalizadas.
+# Clave: ruta + tamaño + mtime (comprobación rápida) y hash del contenido (si el archivo se copió o se tocó
+# sin cambios). Se guarda el DataFrame tipado (fechas como datetime64, frecuencia numérica) con pickle de
+# pandas, que no requiere dependencias extra. No depende de tkinter.
+
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from importacion import nombre_origen
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".saphyton", "cache_equipos")
+MAX_BYTES = 512 * 1024 * 1024                                                       # Tamaño total máximo de la caché
+MAX_EDAD_DIAS = 30                                                                  # Entradas sin usar por más tiempo se eliminan
+VERSION = 2                                                                         # Subir si cambia la normalización de importacion.py
+
+_INDICE = "indice.json"
+
+
+def hash_archivo(path, bloque: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def _leer_indice(directorio) -> dict:
+    try:
+        with open(os.path.join(directorio, _INDICE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_indice(directorio, indice: dict) -> None:
+    tmp = os.path.join(directorio, _INDICE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(directorio, _INDICE))                             # Escritura atómica
+
+
+def obtener(path, directorio: str = CACHE_DIR):
+    """Devuelve el DataFrame en caché para el archivo path, o None si no hay una entrada válida."""
+    indice = _leer_indice(directorio)
+    if not indice:
+        return None
+
+    clave = os.path.abspath(path)
+    st = os.stat(path)
+    entrada = indice.get(clave)
+    if not (
+        entrada
+        and entrada.get("version") == VERSION
+        and entrada["size"] == st.st_size
+        and entrada["mtime"] == st.st_mtime_ns
+    ):
+        # Ruta o fecha distintas: se busca por contenido
+        contenido = hash_archivo(path)
+        entrada = next(
+            (e for e in indice.values() if e.get("version") == VERSION and e["hash"] == contenido),
+            None,
+        )
+        if entrada is None:
+            return None
+        entrada = dict(entrada, size=st.st_size, mtime=st.st_mtime_ns)
+
+    try:
+        df = pd.read_pickle(os.path.join(directorio, entrada["archivo"]))
+    except Exception:                   # Corrupta o de otra versión de pandas (UnpicklingError, ModuleNotFoundError...)
+        indice.pop(clave, None)
+        _guardar_indice(directorio, indice)
+        return None
+
+    entrada["usado"] = time.time()
+    indice[clave] = entrada
+    _guardar_indice(directorio, indice)
+
+    # La entrada pudo encontrarse por contenido desde otro archivo: el origen es siempre el de path
+    if "origen" in df.columns:
+        df["origen"] = nombre_origen(path)
+    return df
+
+
+def guardar(path, df: pd.DataFrame, directorio: str = CACHE_DIR) -> None:
+    """Guarda df como la versión normalizada de path y aplica la política de expulsión."""
+    os.makedirs(directorio, exist_ok=True)
+    st = os.stat(path)
+    contenido = hash_archivo(path)
+    archivo = f"{contenido}.pkl"
+    df.to_pickle(os.path.join(directorio, archivo))
+
+    indice = _leer_indice(directorio)
+    ahora = time.time()
+    indice[os.path.abspath(path)] = {
+        "size": st.st_size,
+        "mtime": st.st_mtime_ns,
+        "hash": contenido,
+        "archivo": archivo,
+        "bytes": os.path.getsize(os.path.join(directorio, archivo)),
+        "version": VERSION,
+        "creado": ahora,
+        "usado": ahora,
+    }
+    _guardar_indice(directorio, _expulsar(directorio, indice))
+
+
+def _expulsar(directorio, indice: dict) -> dict:
+    """Quita entradas viejas o de otra versión y, si se supera MAX_BYTES, las menos usadas."""
+    limite = time.time() - MAX_EDAD_DIAS * 86400
+    vigentes = {
+        k: e for k, e in indice.items() if e.get("version") == VERSION and e["usado"] >= limite
+    }
+
+    total = sum(e["bytes"] for e in {e["archivo"]: e for e in vigentes.values()}.values())
+    for clave, entrada in sorted(vigentes.items(), key=lambda kv: kv[1]["usado"]):
+        if total <= MAX_BYTES:
+            break
+        del vigentes[clave]
+        if all(e["archivo"] != entrada["archivo"] for e in vigentes.values()):
+            total -= entrada["bytes"]
+
+    # Borrar los archivos que ya no referencia ninguna entrada
+    usados = {e["archivo"] for e in vigentes.values()}
+    for nombre in os.listdir(directorio):
+        if nombre.endswith(".pkl") and nombre not in usados:
+            try:
+                os.remove(os.path.join(directorio, nombre))
+            except OSError:
+                pass
+    return vigentes
+
+
+def limpiar(directorio: str = CACHE_DIR) -> None:
+    """Vacía la caché por completo."""
+    if not os.path.isdir(directorio):
+        return
+    for nombre in os.listdir(directorio):
+        if nombre.endswith(".pkl") or nombre == _INDICE:
+            os.remove(os.path.join(directorio, nombre))
@@ -0,0 +1,290 @@
+# Línea de comandos de SAPhyton, sin interfaz gráfica (no importa tkinter ni PIL).
+# Sirve para tareas programadas en un servidor; cada sitio es un proceso independiente con su propia BD.
+#
+#   python cli.py importar equipos.xlsx --bd sitio.db [--fecha 15/03/2026]
+#   python cli.py importar carpeta_sitios/ otro.xlsx --bd red.db [--procesos 8]   (lote en paralelo)
+#   python cli.py reimportar inventario.xlsx --bd sitio.db [--simular] [--por-origen]
+#   python cli.py estado equipos.xlsx [--salida estado.csv|estado.json]
+#   python cli.py cumplimiento cumplidos.csv|lector.log --bd sitio.db
+#   python cli.py programar --bd sitio.db [--hasta 31/12/2026]
+#   python cli.py historial EQ-0001 --bd sitio.db [--salida historial.json]
+#   python cli.py resumen --bd sitio.db [--salida resumen.json]
+#   python cli.py informe --bd sitio.db --plantilla plantilla.tex --salida informe.tex --periodo "..."
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from database import (
+    guardar_plan, marcar_cumplidos, programar_siguientes, historial_equipo, diferencias_equipos, aplicar_diferencias,
+    fecha_a_iso, close_all,
+)
+from estado_mantenimiento import agregar_estado
+from importacion import importar_equipos, importar_lote, filas_inventario, iter_cumplimientos
+import cache_equipos
+from resumen import resumen_plan, DIAS_POR_VENCER
+from generador_latex import fecha_actual_espanol, generar_informe_desde_archivos
+
+
+COLS_ESTADO = [
+    "codigo", "equipo", "marca", "modelo", "ubicacion", "responsable",
+    "frecuencia_meses", "ultimo_mantenimiento", "proximo_mantenimiento", "estado",
+]
+
+
+def _aviso(texto):
+    print(texto, file=sys.stderr)
+
+
+def _cargar_equipos(path, usar_cache=True, hoy=None):
+    """Base de equipos normalizada y con estado; reutiliza la caché de la interfaz gráfica."""
+    df = None
+    if usar_cache:
+        try:
+            df = cache_equipos.obtener(path)
+        except OSError:
+            df = None
+    if df is None:
+        df = importar_equipos(path)
+        if usar_cache:
+            try:
+                cache_equipos.guardar(path, df)
+            except OSError as e:
+                _aviso(f"[AVISO] No se pudo guardar la caché de {path}: {e}")
+    return agregar_estado(df, hoy=hoy)
+
+
+def _escribir_json(datos, salida):
+    texto = json.dumps(datos, ensure_ascii=False, indent=2)
+    if salida:
+        Path(salida).write_text(texto, encoding="utf-8")
+    else:
+        print(texto)
+
+
+# ---------------- Subcomandos ----------------
+def _cargar_entrada(args):
+    """
+    Un archivo (con caché) o, con varios archivos o una carpeta, un lote leído en paralelo.
+    Devuelve (df, errores): errores = [(origen, mensaje)] de los archivos u hojas que no se pudieron leer.
+    """
+    if len(args.archivos) == 1 and not Path(args.archivos[0]).is_dir():
+        return _cargar_equipos(args.archivos[0], usar_cache=not args.sin_cache), []
+    df, errores = importar_lote(args.archivos, procesos=args.procesos)
+    for origen, msg in errores:
+        _aviso(f"[AVISO] {origen}: {msg}")
+    print(f"{len(df)} filas de {df['origen'].nunique()} hojas")
+    return agregar_estado(df), errores
+
+
+def cmd_importar(args):
+    """
+    Carga la base de equipos y guarda una tarea por equipo (fecha dada o próximo mantenimiento).
+    Con varios archivos o una carpeta, cada hoja se lee en un proceso aparte y todo se guarda en una transacción.
+    """
+    df, _ = _cargar_entrada(args)                                                   # Los ilegibles ya se avisaron
+    fecha = fecha_a_iso(args.fecha) if args.fecha else None
+
+    total = len(df)
+    df = df[df["codigo"] != ""]
+    sin_codigo = total - len(df)
+    if fecha:
+        df = df.assign(fecha_tentativa=fecha)
+    else:
+        df = df.assign(fecha_tentativa=df["proximo_mantenimiento"].dt.strftime("%Y-%m-%d"))
+    sin_fecha = int(df["fecha_tentativa"].isna().sum())
+    df = df[df["fecha_tentativa"].notna()]
+
+    res = guardar_plan(args.bd, df.to_dict("records"))
+    print(
+        f"{args.bd}: {res['insertados']} nuevos, {res['actualizados']} actualizados, "
+        f"{res['omitidos']} sin cambios"
+    )
+    if sin_codigo or sin_fecha:
+        _aviso(f"Omitidos: {sin_codigo} sin código, {sin_fecha} sin fecha de próximo mantenimiento")
+    return 0
+
+
+def cmd_reimportar(args):
+    """
+    Compara el inventario con el maestro de la BD y aplica solo altas, cambios y bajas.
+    Los equipos de archivos u hojas que no se pudieron leer no se dan de baja (faltan en el inventario
+    porque no se leyeron, no porque ya no estén).
+    """
+    df, errores = _cargar_entrada(args)
+    alcance = None
+    if args.por_origen:
+        alcance = {origen.split(" › ")[0] for origen in df["origen"].unique()}
+    ilegibles = {origen for origen, _ in errores}
+    dif = diferencias_equipos(args.bd, filas_inventario(df), alcance=alcance, excluir=ilegibles)
+    print(
+        f"{args.bd}: {len(dif['nuevos'])} nuevos, {len(dif['modificados'])} modificados, "
+        f"{len(dif['retirados'])} dados de baja, {dif['sin_cambios']} sin cambios"
+    )
+    if dif["retirados"]:
+        _aviso(f"Bajas: {', '.join(dif['retirados'])}")
+    if ilegibles:
+        _aviso(f"No se dan de baja equipos de lo que no se pudo leer: {', '.join(sorted(ilegibles))}")
+    if args.simular:
+        print("Simulación: no se escribió nada")
+    else:
+        aplicar_diferencias(args.bd, dif)
+    return 0
+
+
+def cmd_estado(args):
+    """Calcula el estado (Pendiente / Próximo / Al día) de cada equipo y lo escribe en CSV o JSON."""
+    hoy = fecha_a_iso(args.hoy) if args.hoy else None
+    df = _cargar_equipos(args.archivo, usar_cache=not args.sin_cache, hoy=hoy)
+    df = df[COLS_ESTADO].copy()
+    for col in ("ultimo_mantenimiento", "proximo_mantenimiento"):
+        df[col] = df[col].dt.strftime("%Y-%m-%d")
+
+    if args.salida and Path(args.salida).suffix.lower() == ".json":
+        _escribir_json(json.loads(df.to_json(orient="records", force_ascii=False)), args.salida)
+    else:
+        df.to_csv(args.salida or sys.stdout, index=False)
+    if args.salida:
+        conteo = df["estado"].value_counts()
+        print(", ".join(f"{estado}: {n}" for estado, n in conteo.items()))
+    return 0
+
+
+def cmd_cumplimiento(args):
+    """Marca cumplidos a partir de un CSV (Código[, Fecha]) o de un registro de lector de códigos."""
+    res = marcar_cumplidos(args.bd, iter_cumplimientos(args.archivo))
+    print(f"{args.bd}: {res['marcados']} mantenimientos marcados como cumplidos")
+    if res["desconocidos"]:
+        _aviso(f"Códigos desconocidos ({len(res['desconocidos'])}): {', '.join(res['desconocidos'])}")
+    if res["ambiguos"]:
+        _aviso(f"Códigos ambiguos ({len(res['ambiguos'])}): {', '.join(res['ambiguos'])}")
+    if res["sin_pendientes"]:
+        _aviso(f"Sin tareas pendientes ({len(res['sin_pendientes'])}): {', '.join(res['sin_pendientes'])}")
+    return 0
+
+
+def cmd_programar(args):
+    """Crea la tarea del ciclo siguiente de cada equipo sin pendientes, a partir del historial de la BD."""
+    creadas = programar_siguientes(args.bd, hasta=args.hasta)
+    print(f"{args.bd}: {creadas} tareas programadas")
+    return 0
+
+
+def cmd_historial(args):
+    """Eventos de mantenimiento de un equipo en JSON, del más reciente al más antiguo."""
+    eventos = historial_equipo(args.bd, args.codigo)
+    if not eventos:
+        _aviso(f"Sin eventos registrados para {args.codigo}")
+    _escribir_json(
+        [
+            {"fecha": fecha, "tipo": tipo, "tarea_id": tarea_id, "registrado_en": registrado_en}
+            for fecha, tipo, tarea_id, registrado_en in eventos
+        ],
+        args.salida,
+    )
+    return 0
+
+
+def cmd_resumen(args):
+    """Indicadores del plan en JSON (los mismos que la ventana de Resumen e Insights)."""
+    res = resumen_plan(args.bd, dias=args.dias)
+    for clave in ("atrasados", "proximos", "por_vencer"):
+        res[clave] = res[clave].to_dict("records")
+    res["porcentaje"] = round(res["porcentaje"], 1)
+    _escribir_json(res, args.salida)
+    return 0
+
+
+def cmd_informe(args):
+    """Genera el informe LaTeX a partir de la BD y la plantilla."""
+    generar_informe_desde_archivos(
+        Path(args.bd),
+        Path(args.plantilla),
+        Path(args.salida),
+        args.periodo,
+        args.fecha_presentacion or fecha_actual_espanol(),
+    )
+    print(f"Informe generado: {args.salida}")
+    return 0
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="saphyton", description="SAPhyton - Sistema de Mantenimiento (sin interfaz)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("importar", help="Importa la base de equipos (.xlsx/.csv) al plan de la BD")
+    p.add_argument("archivos", nargs="+", help="Uno o más libros/CSV, o carpetas que los contengan")
+    p.add_argument("--bd", required=True, help="Base de datos SQLite (.db)")
+    p.add_argument("--fecha", help="Fecha tentativa para todos (dd/mm/yyyy); por defecto, el próximo mantenimiento")
+    p.add_argument("--procesos", type=int, help="Procesos para un lote; por defecto, uno por núcleo")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de importaciones")
+    p.set_defaults(func=cmd_importar)
+
+    p = sub.add_parser("reimportar", help="Actualiza el maestro de equipos con un inventario nuevo (incremental)")
+    p.add_argument("archivos", nargs="+", help="Uno o más libros/CSV, o carpetas que los contengan")
+    p.add_argument("--bd", required=True, help="Base de datos SQLite (.db)")
+    p.add_argument("--simular", action="store_true", help="Solo mostrar los cambios, sin aplicarlos")
+    p.add_argument(
+        "--por-origen", action="store_true",
+        help="Dar de baja solo equipos importados desde estos mismos archivos (lotes por sitio)",
+    )
+    p.add_argument("--procesos", type=int, help="Procesos para un lote; por defecto, uno por núcleo")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de importaciones")
+    p.set_defaults(func=cmd_reimportar)
+
+    p = sub.add_parser("estado", help="Calcula el estado de mantenimiento de cada equipo")
+    p.add_argument("archivo")
+    p.add_argument("--salida", help="Archivo .csv o .json; por defecto, CSV por la salida estándar")
+    p.add_argument("--hoy", help="Fecha de referencia (dd/mm/yyyy); por defecto, hoy")
+    p.add_argument("--sin-cache", action="store_true", help="No usar la caché de importaciones")
+    p.set_defaults(func=cmd_estado)
+
+    p = sub.add_parser(
+        "cumplimiento", help="Marca cumplidos desde un CSV (Código[, Fecha]) o un registro de lector de códigos"
+    )
+    p.add_argument("archivo")
+    p.add_argument("--bd", required=True, help="Base de datos SQLite (.db)")
+    p.set_defaults(func=cmd_cumplimiento)
+
+    p = sub.add_parser("programar", help="Programa el próximo mantenimiento de los equipos sin tareas pendientes")
+    p.add_argument("--bd", required=True, help="Base de datos SQLite (.db)")
+    p.add_argument("--hasta", help="Solo equipos que vencen hasta esta fecha (dd/mm/yyyy)")
+    p.set_defaults(func=cmd_programar)
+
+    p = sub.add_parser("historial", help="Historial de mantenimientos de un equipo en JSON")
+    p.add_argument("codigo", help="Código del equipo")
+    p.add_argument("--bd", required=True, help="Base de datos SQLite (.db)")
+    p.add_argument("--salida", help="Archivo .json; por defecto, la salida estándar")
+    p.set_defaults(func=cmd_historial)
+
+    p = sub.add_parser("resumen", help="Indicadores del plan en JSON")
+    p.add_argument("--bd", required=True, help="Base de datos SQLite (.db)")
+    p.add_argument("--salida", help="Archivo .json; por defecto, la salida estándar")
+    p.add_argument("--dias", type=int, default=DIAS_POR_VENCER, help="Horizonte de por_vencer, en días")
+    p.set_defaults(func=cmd_resumen)
+
+    p = sub.add_parser("informe", help="Genera el informe LaTeX del plan")
+    p.add_argument("--bd", required=True, help="Base de datos SQLite (.db)")
+    p.add_argument("--plantilla", required=True, help="Plantilla LaTeX con el marcador de tablas")
+    p.add_argument("--salida", required=True, help="Archivo .tex de salida")
+    p.add_argument("--periodo", required=True, help='Período académico, p. ej. "agosto 2025 -- enero 2026"')
+    p.add_argument("--fecha-presentacion", help="Texto de la fecha; por defecto, la fecha actual en español")
+    p.set_defaults(func=cmd_informe)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = crear_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (ValueError, FileNotFoundError, RuntimeError, OSError) as e:
+        _aviso(f"Error: {e}")
+        return 1
+    finally:
+        close_all()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,19 @@
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
 import datetime
-import sqlite3
 import os
-from database import ensure_table, PLAN_TABLE
+from database import (
+    ensure_table, guardar_cumplimientos, marcar_cumplidos, buscar_equipos, sql_fecha_ui, iso_a_ui, valores_distintos, filtros_plan, ConsultaPaginada,
+)
+from importacion import iter_cumplimientos
+from widgets import TablaMarcable, CampoBusqueda
+
+
+# Columnas de la tabla (además de la marca de cumplido)
+COLUMNAS = ("id", "equipo", "marca", "modelo", "codigo", "ubicacion", "fecha_tentativa", "fecha_cumplimiento")
+ETIQUETAS = ("ID", "Equipo", "Marca", "Modelo", "Código", "Ubicación", "Programado", "Cumplido el")
+ANCHOS = {"id": 60, "equipo": 180, "codigo": 90, "fecha_tentativa": 90, "fecha_cumplimiento": 90}
+TODOS = "Todos"
 
 
 class CumplimientoApp:
@@ -13,7 +23,7 @@ class CumplimientoApp:
         self.menu_root = menu_root
 
         self.root.title("Cumplimiento de Mantenimiento")
-        self.root.geometry("900x600")
+        self.root.geometry("1100x600")
 
         # 👈 importantísimo: cuando cierras con la X, se llama a volver()
         self.root.protocol("WM_DELETE_WINDOW", self.volver)
@@ -69,29 +79,57 @@ class CumplimientoApp:
             style="GreenButton.TButton"
         ).pack(side="right", padx=6)
 
-        # ===== Contenedor con scroll =====
+        # ===== Filtros (se resuelven en el WHERE de SQLite) =====
+        barra = ttk.Frame(self.root)
+        barra.pack(fill="x", padx=10, pady=(0, 5))
+
+        ttk.Label(barra, text="Buscar:").pack(side="left", padx=(0, 4))
+        # Búsqueda mientras se escribe: prefijos de código, modelo, marca... en el índice FTS5,
+        # con los equipos más relevantes como sugerencias
+        self.ent_texto = CampoBusqueda(barra, self.sugerencias, self.aplicar_filtros, width=16)
+        self.ent_texto.pack(side="left", padx=4)
+
+        ttk.Label(barra, text="Ubicación:").pack(side="left", padx=(8, 4))
+        self.combo_ubic = ttk.Combobox(barra, state="readonly", width=20, values=[TODOS])
+        self.combo_ubic.set(TODOS)
+        self.combo_ubic.pack(side="left", padx=4)
+
+        ttk.Label(barra, text="Responsable:").pack(side="left", padx=(8, 4))
+        self.combo_resp = ttk.Combobox(barra, state="readonly", width=16, values=[TODOS])
+        self.combo_resp.set(TODOS)
+        self.combo_resp.pack(side="left", padx=4)
+
+        ttk.Label(barra, text="Desde:").pack(side="left", padx=(8, 4))
+        self.ent_desde = ttk.Entry(barra, width=11)
+        self.ent_desde.pack(side="left", padx=4)
+        ttk.Label(barra, text="Hasta:").pack(side="left", padx=(8, 4))
+        self.ent_hasta = ttk.Entry(barra, width=11)
+        self.ent_hasta.pack(side="left", padx=4)
+
+        self.solo_pendientes = BooleanVar(value=False)
+        ttk.Checkbutton(
+            barra, text="Solo pendientes", variable=self.solo_pendientes, command=self.aplicar_filtros
+        ).pack(side="left", padx=8)
+
+        ttk.Button(barra, text="Este mes", command=self.este_mes).pack(side="left", padx=4)
+        ttk.Button(barra, text="Filtrar", command=self.aplicar_filtros).pack(side="left", padx=4)
+
+        for w in (self.ent_desde, self.ent_hasta):
+            w.bind("<Return>", self.aplicar_filtros)
+        for w in (self.combo_ubic, self.combo_resp):
+            w.bind("<<ComboboxSelected>>", self.aplicar_filtros)
+
+        # ===== Tabla virtualizada: solo existen las filas visibles =====
         cont = ttk.Frame(self.root)
         cont.pack(fill="both", expand=True, padx=10, pady=10)
 
-        self.canvas = Canvas(cont, bg=BG_COLOR, highlightthickness=0)
-        self.scroll = ttk.Scrollbar(cont, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.scroll.set)
-
-        self.scroll.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
+        self.lbl_info = ttk.Label(cont, text="Marque los equipos mantenidos:", font=("Arial", 11, "bold"))
+        self.lbl_info.pack(anchor="w", pady=6)
 
-        # Frame interior donde irán los registros
-        self.inner = ttk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.inner, anchor="nw")
-
-        # Ajustar región de scroll cuando cambie el contenido
-        self.inner.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self.tabla = TablaMarcable(
+            cont, COLUMNAS, ETIQUETAS, anchos=ANCHOS, al_cambiar=self._on_marca, al_final=self.cargar_mas
         )
-
-        # Opcional: scroll con la rueda del ratón
-        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.tabla.pack(fill="both", expand=True)
 
         # ===== Footer =====
         bottom = ttk.Frame(self.root)
@@ -104,6 +142,13 @@ class CumplimientoApp:
             style="GreenButton.TButton"
         ).pack(side="left", padx=5, fill="x")
 
+        ttk.Button(
+            bottom,
+            text="📥 Importar cumplidos (CSV / lector)",
+            command=self.importar_cumplidos,
+            style="GreenButton.TButton"
+        ).pack(side="left", padx=5, fill="x")
+
         ttk.Button(
             bottom,
             text="⬅ Volver",
@@ -111,13 +156,22 @@ class CumplimientoApp:
             style="GreenButton.TButton"
         ).pack(side="right", padx=5, fill="x")
 
-        self.check_vars = {}
-        self.registros = []
+        self.ids = []           # ids del plan que cumplen el filtro, en el orden de la tabla (páginas ya leídas)
+        self.registros = {}     # id -> (columnas de COLUMNAS), de todas las páginas leídas con cualquier filtro
+        self.cumplidos = set()  # ids leídos que están cumplidos en la BD (al cargar o tras el último guardado)
+        self.consulta = None
+        self.total = 0
         self.plan_db = None
 
     # ---------- Navegación ----------
     def volver(self):
         """Cerrar esta ventana y volver al menú principal."""
+        marcar, desmarcar = self.cambios()
+        pendientes = len(marcar) + len(desmarcar)
+        if pendientes and not messagebox.askyesno(
+            "Cambios sin guardar", f"Hay {pendientes} cambios sin guardar. ¿Salir igualmente?"
+        ):
+            return
         try:
             self.root.destroy()          # cerrar Toplevel de Cumplimiento
         finally:
@@ -125,11 +179,6 @@ class CumplimientoApp:
             if self.menu_root is not None:
                 self.menu_root.deiconify()
 
-    # ---------- Scroll rueda ratón (opcional) ----------
-    def _on_mousewheel(self, event):
-        # En Windows el delta suele ser 120/-120
-        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-
     # ---------- Seleccionar BD ----------
     def sel_bd(self):
         path = filedialog.askopenfilename(
@@ -139,59 +188,121 @@ class CumplimientoApp:
         if not path:
             return
 
+        marcar, desmarcar = self.cambios()
+        if (marcar or desmarcar) and not messagebox.askyesno(
+            "Cambios sin guardar",
+            f"Hay {len(marcar) + len(desmarcar)} cambios sin guardar en la BD actual. ¿Descartarlos?",
+        ):
+            return
+
         self.plan_db = path
         self.lbl.config(text=os.path.basename(path))
 
         # crea tabla si no existe
         ensure_table(self.plan_db)
 
-        conn = sqlite3.connect(self.plan_db)
-        cur = conn.cursor()
-        cur.execute(f"""
-            SELECT id, equipo, marca, modelo, codigo, ubicacion, fecha_tentativa,
-                   cumplido, fecha_cumplimiento 
-            FROM {PLAN_TABLE}
-        """)
-        self.registros = cur.fetchall()
-        conn.close()
-
+        # Las filas se piden por páginas, con el orden y los filtros resueltos en SQL
+        self.consulta = ConsultaPaginada(
+            self.plan_db,
+            COLUMNAS + ("cumplido",),
+            expresiones={c: sql_fecha_ui(c) for c in ("fecha_tentativa", "fecha_cumplimiento")},
+        )
+        self.consulta.ordenar("fecha_tentativa", descendente=False)
+        self.registros.clear()
+        self.cumplidos.clear()
+        self.tabla.marcados.clear()
+
+        self.combo_ubic.config(values=[TODOS] + valores_distintos(self.plan_db, "ubicacion"))
+        self.combo_resp.config(values=[TODOS] + valores_distintos(self.plan_db, "responsable"))
+        self.combo_ubic.set(TODOS)
+        self.combo_resp.set(TODOS)
+        self.aplicar_filtros()
+
+    # ---------- Filtros y páginas ----------
+    def este_mes(self):
+        hoy = datetime.date.today()
+        inicio = hoy.replace(day=1)
+        fin = (inicio + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+        for ent, fecha in ((self.ent_desde, inicio), (self.ent_hasta, fin)):
+            ent.delete(0, END)
+            ent.insert(0, fecha.strftime("%d/%m/%Y"))
+        self.aplicar_filtros()
+
+    def aplicar_filtros(self, event=None):
+        """
+        Vuelve a consultar con los filtros actuales y muestra la primera página.
+        Las marcas sin guardar se conservan: viven por id, no por filtro.
+        """
+        if self.consulta is None:
+            return
+        ubic, resp = self.combo_ubic.get(), self.combo_resp.get()
+        try:
+            filtros = filtros_plan(
+                texto=self.ent_texto.get(),
+                ubicacion="" if ubic == TODOS else ubic,
+                responsable="" if resp == TODOS else resp,
+                cumplido=0 if self.solo_pendientes.get() else None,
+                desde=self.ent_desde.get(),
+                hasta=self.ent_hasta.get(),
+            )
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=self.root)
+            return
+        self.consulta.filtrar(filtros)
+        self.total = self.consulta.contar()
+        self.ids = []
+        self._leer_pagina()
         self.mostrar()
 
+    def sugerencias(self, texto):
+        """Equipos más relevantes para el texto buscado: [(código, etiqueta)] para CampoBusqueda."""
+        if not self.plan_db:
+            return []
+        return [
+            (codigo, f"{codigo} — {equipo} ({ubicacion})")
+            for _id, codigo, equipo, _marca, _modelo, ubicacion in buscar_equipos(self.plan_db, texto, limite=15)
+        ]
+
+    def _leer_pagina(self):
+        for *valores, cumplido in self.consulta.siguiente():
+            _id = valores[0]
+            self.ids.append(_id)
+            if _id in self.registros:
+                continue        # Ya leído con otro filtro: se conservan su marca y lo guardado desde aquí
+            self.registros[_id] = tuple(valores)
+            if cumplido:
+                self.cumplidos.add(_id)
+                self.tabla.marcados.add(_id)
+
+    def cargar_mas(self):
+        """La tabla llegó cerca del final de las filas leídas: se pide la página siguiente."""
+        if self.consulta is None or self.consulta.agotada:
+            return
+        self._leer_pagina()
+        self.tabla.refrescar()
+        self._actualizar_info()
+
     # ---------- Mostrar registros ----------
     def mostrar(self):
-        # limpiar
-        for w in self.inner.winfo_children():
-            w.destroy()
-
-        self.check_vars.clear()
-
-        ttk.Label(
-            self.inner,
-            text="Marque los equipos mantenidos:",
-            font=("Arial", 11, "bold")
-        ).pack(anchor="w", pady=6)
-
-        for r in self.registros:
-            _id, eq, ma, mo, co, ub, ft, cu, fc = r
-            texto = (
-                f"[{_id}] {eq} | {ma} | {mo} | {co} | {ub} | "
-                f"Prog: {ft} | Cumplido: {'Sí' if cu else 'No'}"
-            )
-
-            v = IntVar(value=1 if cu else 0)
-            cb = Checkbutton(
-                self.inner,
-                text=texto,
-                variable=v,
-                bg="#F0F3F4",
-                anchor="w",
-                padx=8
-            )
-            cb.pack(fill="x", pady=3)
-            self.check_vars[_id] = v
-
-        # 👈 opcional: volver arriba del scroll
-        self.canvas.yview_moveto(0)
+        """Tiempo constante: la tabla solo pide las filas visibles a self.registros."""
+        self.tabla.set_datos(self.ids, self.registros.__getitem__, marcados=self.tabla.marcados)
+        self._actualizar_info()
+
+    def _actualizar_info(self):
+        marcar, desmarcar = self.cambios()
+        texto = f"Marque los equipos mantenidos ({self.total} registros, {len(self.ids)} leídos)"
+        if marcar or desmarcar:
+            texto += f" — {len(marcar) + len(desmarcar)} cambios sin guardar"
+        self.lbl_info.config(text=texto + ":")
+
+    def _on_marca(self, _id, marcado):
+        self._actualizar_info()
+
+    # ---------- Cambios ----------
+    def cambios(self):
+        """(ids a marcar, ids a desmarcar): diferencia entre las marcas de la tabla y lo que hay en la BD."""
+        marcados = self.tabla.marcados
+        return marcados - self.cumplidos, self.cumplidos - marcados
 
     # ---------- Guardar ----------
     def guardar(self):
@@ -199,30 +310,73 @@ class CumplimientoApp:
             messagebox.showwarning("Atención", "Primero selecciona una base de datos.")
             return
 
-        hoy = datetime.date.today().strftime("%d/%m/%Y")
-        conn = sqlite3.connect(self.plan_db)
-        cur = conn.cursor()
-        actualizados = 0
-
-        for _id, var in self.check_vars.items():
-            if var.get() == 1:
-                cur.execute(f"""
-                    UPDATE {PLAN_TABLE}
-                    SET cumplido = 1, fecha_cumplimiento = ?
-                    WHERE id = ?
-                """, (hoy, _id))
-            else:
-                cur.execute(f"""
-                    UPDATE {PLAN_TABLE}
-                    SET cumplido = 0, fecha_cumplimiento = NULL
-                    WHERE id = ?
-                """, (_id,))
-            actualizados += cur.rowcount
-
-        conn.commit()
-        conn.close()
+        # Solo las filas que cambiaron desde la carga; las ya cumplidas conservan su fecha real
+        marcar, desmarcar = self.cambios()
+        if not marcar and not desmarcar:
+            messagebox.showinfo("Sin cambios", "No hay cambios para guardar.")
+            return
+
+        hoy = datetime.date.today().isoformat()  # ISO en la BD
+        try:
+            actualizados = guardar_cumplimientos(self.plan_db, marcar, desmarcar, hoy)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron guardar los cambios:\n{e}")
+            return
+
+        # Reflejar lo guardado sin volver a leer la BD
+        for _id in marcar:
+            self.registros[_id] = self.registros[_id][:-1] + (iso_a_ui(hoy),)
+        for _id in desmarcar:
+            self.registros[_id] = self.registros[_id][:-1] + ("",)
+        self.cumplidos = set(self.tabla.marcados)
+        self.tabla.refrescar()
+        self._actualizar_info()
 
         messagebox.showinfo(
             "Éxito",
             f"Se actualizaron {actualizados} registros en:\n{self.plan_db}"
         )
+
+    # ---------- Importar cumplidos ----------
+    def importar_cumplidos(self):
+        """Marca cumplidos desde un CSV (Código[, Fecha]) o un registro de lector, en una sola transacción."""
+        if not self.plan_db:
+            messagebox.showwarning("Atención", "Primero selecciona una base de datos.")
+            return
+        marcar, desmarcar = self.cambios()
+        if (marcar or desmarcar) and not messagebox.askyesno(
+            "Cambios sin guardar",
+            f"Hay {len(marcar) + len(desmarcar)} cambios sin guardar que se descartarán. ¿Continuar?",
+        ):
+            return
+        path = filedialog.askopenfilename(
+            title="Selecciona el archivo de cumplidos",
+            filetypes=[("CSV o registro de lector", "*.csv *.txt *.log"), ("Todos", "*.*")],
+        )
+        if not path:
+            return
+
+        try:
+            res = marcar_cumplidos(self.plan_db, iter_cumplimientos(path))
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", f"No se pudo importar {os.path.basename(path)}:\n{e}")
+            return
+
+        # La BD cambió por fuera de la tabla: se vuelve a leer con los filtros actuales
+        self.registros.clear()
+        self.cumplidos.clear()
+        self.tabla.marcados.clear()
+        self.aplicar_filtros()
+
+        texto = f"Se marcaron {res['marcados']} mantenimientos como cumplidos."
+        for clave, titulo in (
+            ("desconocidos", "Códigos desconocidos"),
+            ("ambiguos", "Códigos ambiguos (varios equipos)"),
+            ("sin_pendientes", "Sin tareas pendientes"),
+        ):
+            codigos = res[clave]
+            if codigos:
+                texto += f"\n\n{titulo} ({len(codigos)}): {', '.join(codigos[:20])}"
+                if len(codigos) > 20:
+                    texto += ", ..."
+        messagebox.showinfo("Importación de cumplidos", texto)
@@ -2,8 +2,19 @@
 
 import sqlite3
 import os
+import atexit
+import threading
+import datetime as dt
+import json
 
-PLAN_TABLE = "plan_mantenimiento"                                                                   # Contiene el nombre de la tabla principal del sistema.
+PLAN_TABLE = "plan_mantenimiento"                                                                   # Contiene el nombre de la tabla principal del sistema (desde v4 es una vista).
+EQUIPOS_TABLE = "equipos"                                                                           # Maestro de equipos, una fila por código
+TAREAS_TABLE = "plan_tareas"                                                                        # Filas del plan: referencia al equipo + campos de programación
+PAPELERA_TABLE = "plan_eliminados"                                                                  # Filas borradas del plan, para poder deshacer
+EVENTOS_TABLE = "mantenimiento_eventos"                                                             # Historial de mantenimientos (solo se agrega)
+BUSQUEDA_TABLE = "equipos_fts"                                                                      # Índice de texto completo (FTS5) sobre el maestro de equipos
+COLS_BUSQUEDA = ("equipo", "marca", "modelo", "codigo", "ubicacion", "responsable")
+MAX_LOTES_PAPELERA = 20                                                                             # Eliminaciones que se pueden deshacer
 ULT_MANT = "ultimo_mantenimiento"
 FREC = "frecuencia_meses"
 
@@ -23,15 +34,1332 @@ TARGET_COLUMNS = {
     "frecuencia_meses": "INTEGER"                                                                   #
 }
 
-def ensure_table(db_path: str):                                                                     # Defino la función: ensure_table, que toma como argumento: db_path 
-    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)                           # Asegura  que exista carpeta para guardar la base de datos. Si no existe, la crea automáticamente.
-    conn = sqlite3.connect(db_path)                                                                 # Me conecto a la base de datos mediante el path: db_path
-    cur = conn.cursor()                                                                             # Función de sqlite3 que permite ejecutar comandos SQL.
+DATE_COLUMNS = ("fecha_tentativa", "fecha_cumplimiento", "ultimo_mantenimiento")                    # Se guardan como texto ISO (yyyy-mm-dd): ordenable e indexable
+FORMATO_UI = "%d/%m/%Y"                                                                             # Formato que ve el usuario
+FORMATO_ISO = "%Y-%m-%d"                                                                            # Formato guardado en la BD
+
+
+# ---------------- Fechas ----------------
+def fecha_a_iso(valor):
+    """
+    Convierte una fecha de la UI (dd/mm/yyyy), un date/datetime o un texto ya ISO a 'yyyy-mm-dd'.
+    Devuelve None si el valor está vacío y lanza ValueError si no es una fecha válida.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (dt.date, dt.datetime)):                                                   # También cubre pd.Timestamp
+        return valor.strftime(FORMATO_ISO)
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    for formato in (FORMATO_UI, FORMATO_ISO):
+        try:
+            return dt.datetime.strptime(texto, formato).strftime(FORMATO_ISO)
+        except ValueError:
+            pass
+    raise ValueError(f"Fecha inválida: {texto!r} (use dd/mm/yyyy)")
+
+
+def iso_a_ui(valor) -> str:
+    """Convierte 'yyyy-mm-dd' a 'dd/mm/yyyy' para mostrar. Valores vacíos o no ISO se devuelven como texto."""
+    if valor is None:
+        return ""
+    texto = str(valor).strip()
+    try:
+        return dt.datetime.strptime(texto, FORMATO_ISO).strftime(FORMATO_UI)
+    except ValueError:
+        return texto
+
+
+def sql_fecha_ui(col: str) -> str:
+    """Expresión SQL que devuelve la columna ISO col en formato dd/mm/yyyy (o vacío si es NULL)."""
+    return f"COALESCE(strftime('%d/%m/%Y', {col}), {col}, '')"
+
+
+def sql_proximo(ultimo: str, frecuencia: str) -> str:
+    """
+    Expresión SQL: fecha ISO de ultimo + frecuencia (meses), igual que estado_mantenimiento.proximo_mantenimiento
+    (si el día no existe en el mes destino, el último día del mes). NULL si falta alguno de los dos.
+    """
+    meses = f"CAST({frecuencia} AS INTEGER)"
+    return (
+        f"CASE WHEN {ultimo} IS NULL OR {frecuencia} IS NULL THEN NULL ELSE "
+        f"MIN(date({ultimo}, 'start of month', printf('%+d months', {meses}), "
+        f"printf('+%d days', CAST(strftime('%d', {ultimo}) AS INTEGER) - 1)), "
+        f"date({ultimo}, 'start of month', printf('%+d months', {meses} + 1), '-1 day')) END"
+    )
+
+# ---------------- Conexiones compartidas ----------------
+# Una sola conexión por archivo .db para todo el proceso: abrir/cerrar en cada clic es muy lento
+# en unidades de red, y el modo WAL permite que los lectores no se bloqueen mientras alguien guarda.
+BUSY_TIMEOUT_MS = 5000                                                                              # Espera máxima ante un bloqueo de otro proceso
+PRAGMAS = {                                                                                         #
+    "journal_mode": "WAL",                                                                          # Lectores y escritor concurrentes
+    "synchronous": "NORMAL",                                                                        # Seguro con WAL y mucho más rápido que FULL
+    "mmap_size": 268435456,                                                                         # 256 MB mapeados en memoria
+    "cache_size": -65536,                                                                           # 64 MB de caché de páginas (negativo = KiB)
+    "busy_timeout": BUSY_TIMEOUT_MS,                                                                #
+    "foreign_keys": "ON",                                                                           #
+    "temp_store": "MEMORY",                                                                         #
+}
+
+_conexiones = {}                                                                                    # ruta absoluta -> sqlite3.Connection
+_lock = threading.RLock()                                                                           # Protege _conexiones y serializa el uso entre hilos
+
+
+def _clave(db_path) -> str:
+    return os.path.abspath(os.fspath(db_path))
+
+
+def get_connection(db_path) -> sqlite3.Connection:
+    """
+    Devuelve la conexión compartida para db_path, creándola (y aplicando los PRAGMAs) la primera vez.
+    Usar `with get_connection(path) as conn:` para que la transacción haga commit/rollback sola;
+    la conexión NO se cierra al salir del bloque.
+    """
+    clave = _clave(db_path)
+    with _lock:
+        conn = _conexiones.get(clave)
+        if conn is None:
+            os.makedirs(os.path.dirname(clave), exist_ok=True)                                      # Asegura que exista la carpeta de la BD
+            conn = sqlite3.connect(
+                clave,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+                check_same_thread=False,                                                            # Se comparte entre la UI y los hilos de trabajo
+            )
+            for pragma, valor in PRAGMAS.items():
+                conn.execute(f"PRAGMA {pragma} = {valor}")
+            _conexiones[clave] = conn
+        return conn
+
+
+def close_connection(db_path) -> None:
+    """Cierra la conexión compartida de db_path (si existe), ejecutando antes PRAGMA optimize."""
+    with _lock:
+        conn = _conexiones.pop(_clave(db_path), None)
+        _migradas.discard(_clave(db_path))
+    if conn is not None:
+        _cerrar(conn)
+
+
+def close_all() -> None:
+    """Cierra todas las conexiones abiertas. Se llama al salir de la aplicación."""
+    with _lock:
+        conexiones = list(_conexiones.values())
+        _conexiones.clear()
+        _migradas.clear()
+    for conn in conexiones:
+        _cerrar(conn)
+
+
+def _cerrar(conn: sqlite3.Connection) -> None:
+    try:
+        conn.commit()
+        conn.execute("PRAGMA optimize")                                                             # Actualiza estadísticas del planificador
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+
+
+atexit.register(close_all)
+
+
+# ---------------- Migraciones ----------------
+# La versión del esquema se guarda en PRAGMA user_version; cada migración se aplica una sola vez
+# por archivo y, dentro de un mismo proceso, ensure_table no vuelve a consultar la BD.
+
+def _migracion_columnas(cur):
+    """v1: tabla base. Para BD anteriores al versionado, agrega las columnas que falten."""
     cur.execute(f"CREATE TABLE IF NOT EXISTS {PLAN_TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT)")  # Creo la tabla PLAN_TABLE = "plan_mantenimiento"
     cur.execute(f"PRAGMA table_info({PLAN_TABLE})")                                                 # Devuelve una lista con los nombres y tipos de las columnas actuales
     existing = {row[1] for row in cur.fetchall()}                                                   # Lista de columnas que ya existen en la base de datos. 
     for col, decl in TARGET_COLUMNS.items():                                                        # Extra col de TARGET_COLUMNS para realizar comparación
         if col not in existing:                                                                     # Compara col en existing
             cur.execute(f"ALTER TABLE {PLAN_TABLE} ADD COLUMN {col} {decl}")                        # Si alguna columna no está en la tabla, la agrega automáticamente
-    conn.commit()                                                                                   # Función de sqlite3
-    conn.close()                                                                                    # Cerrar la base de datos
+
+
+def _migracion_indices(cur):
+    """v2: índices para los filtros que usa la aplicación (ubicación, pendientes, fechas, código)."""
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_plan_ubicacion ON {PLAN_TABLE} (ubicacion, fecha_tentativa)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_plan_cumplido ON {PLAN_TABLE} (cumplido, fecha_tentativa)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_plan_fecha ON {PLAN_TABLE} (fecha_tentativa)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_plan_codigo ON {PLAN_TABLE} (codigo, fecha_tentativa)")
+
+
+def _migracion_fechas_iso(cur):
+    """v3: pasa las fechas guardadas como dd/mm/yyyy a ISO yyyy-mm-dd (in situ)."""
+    for col in DATE_COLUMNS:
+        cur.execute(f"SELECT id, {col} FROM {PLAN_TABLE} WHERE {col} LIKE '%/%'")
+        cambios = []
+        for _id, valor in cur.fetchall():
+            try:
+                cambios.append((fecha_a_iso(valor), _id))
+            except ValueError:
+                print(f"[AVISO] Fecha no convertible en {col} (id={_id}): {valor!r}. Se deja sin cambios.")
+        cur.executemany(f"UPDATE {PLAN_TABLE} SET {col} = ? WHERE id = ?", cambios)
+
+
+def _migracion_equipos(cur):
+    """
+    v4: normaliza el plan. Los datos del equipo pasan a EQUIPOS_TABLE (uno por código) y cada fila
+    del plan guarda solo equipo_id + programación en TAREAS_TABLE. PLAN_TABLE queda como vista con
+    triggers INSTEAD OF, así los SELECT/INSERT/UPDATE/DELETE existentes siguen funcionando.
+    Si un mismo código aparece con datos distintos, se conserva la fila más reciente.
+    """
+    clave = "COALESCE(NULLIF(codigo, ''), '#' || id)"                                                 # Filas sin código: un equipo por fila
+    cur.execute(f"""
+        CREATE TABLE {EQUIPOS_TABLE} (
+            id INTEGER PRIMARY KEY,
+            codigo TEXT NOT NULL UNIQUE,
+            equipo TEXT,
+            marca TEXT,
+            modelo TEXT,
+            ubicacion TEXT,
+            responsable TEXT
+        )""")
+    cur.execute(f"""
+        INSERT INTO {EQUIPOS_TABLE} (codigo, equipo, marca, modelo, ubicacion, responsable)
+        SELECT {clave}, equipo, marca, modelo, ubicacion, responsable
+        FROM {PLAN_TABLE}
+        WHERE id IN (SELECT MAX(id) FROM {PLAN_TABLE} GROUP BY {clave})
+        ORDER BY id""")
+    cur.execute(f"""
+        CREATE TABLE {TAREAS_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            equipo_id INTEGER NOT NULL REFERENCES {EQUIPOS_TABLE}(id),
+            fecha_tentativa TEXT,
+            cumplido INTEGER DEFAULT 0,
+            fecha_cumplimiento TEXT,
+            ultimo_mantenimiento TEXT,
+            frecuencia_meses INTEGER
+        )""")
+    cur.execute(f"""
+        INSERT INTO {TAREAS_TABLE}
+            (id, equipo_id, fecha_tentativa, cumplido, fecha_cumplimiento, ultimo_mantenimiento, frecuencia_meses)
+        SELECT p.id, e.id, p.fecha_tentativa, COALESCE(p.cumplido, 0), p.fecha_cumplimiento,
+               p.ultimo_mantenimiento, p.frecuencia_meses
+        FROM {PLAN_TABLE} p
+        JOIN {EQUIPOS_TABLE} e ON e.codigo = COALESCE(NULLIF(p.codigo, ''), '#' || p.id)""")
+    cur.execute(f"DROP TABLE {PLAN_TABLE}")                                                         # Se lleva consigo los índices de v2
+
+    cur.execute(f"CREATE INDEX idx_equipos_ubicacion ON {EQUIPOS_TABLE} (ubicacion, codigo)")
+    cur.execute(f"CREATE INDEX idx_plan_equipo ON {TAREAS_TABLE} (equipo_id, fecha_tentativa)")
+    cur.execute(f"CREATE INDEX idx_plan_cumplido ON {TAREAS_TABLE} (cumplido, fecha_tentativa)")
+    cur.execute(f"CREATE INDEX idx_plan_fecha ON {TAREAS_TABLE} (fecha_tentativa)")
+
+    # Vista de compatibilidad con las columnas de TARGET_COLUMNS
+    cur.execute(f"""
+        CREATE VIEW {PLAN_TABLE} AS
+        SELECT t.id, e.equipo, e.marca, e.modelo, e.codigo, e.ubicacion, e.responsable,
+               t.fecha_tentativa, t.cumplido, t.fecha_cumplimiento,
+               t.ultimo_mantenimiento, t.frecuencia_meses, t.equipo_id
+        FROM {TAREAS_TABLE} t
+        JOIN {EQUIPOS_TABLE} e ON e.id = t.equipo_id""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_insert INSTEAD OF INSERT ON {PLAN_TABLE}
+        BEGIN
+            INSERT INTO {EQUIPOS_TABLE} (codigo, equipo, marca, modelo, ubicacion, responsable)
+            VALUES (NEW.codigo, NEW.equipo, NEW.marca, NEW.modelo, NEW.ubicacion, NEW.responsable)
+            ON CONFLICT (codigo) DO UPDATE SET
+                equipo = excluded.equipo, marca = excluded.marca, modelo = excluded.modelo,
+                ubicacion = excluded.ubicacion, responsable = excluded.responsable;
+            INSERT INTO {TAREAS_TABLE}
+                (equipo_id, fecha_tentativa, cumplido, fecha_cumplimiento, ultimo_mantenimiento, frecuencia_meses)
+            VALUES ((SELECT id FROM {EQUIPOS_TABLE} WHERE codigo = NEW.codigo), NEW.fecha_tentativa,
+                    COALESCE(NEW.cumplido, 0), NEW.fecha_cumplimiento, NEW.ultimo_mantenimiento, NEW.frecuencia_meses);
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_update INSTEAD OF UPDATE ON {PLAN_TABLE}
+        BEGIN
+            UPDATE {TAREAS_TABLE} SET
+                fecha_tentativa = NEW.fecha_tentativa, cumplido = NEW.cumplido,
+                fecha_cumplimiento = NEW.fecha_cumplimiento, ultimo_mantenimiento = NEW.ultimo_mantenimiento,
+                frecuencia_meses = NEW.frecuencia_meses
+            WHERE id = OLD.id;
+            UPDATE {EQUIPOS_TABLE} SET
+                codigo = NEW.codigo, equipo = NEW.equipo, marca = NEW.marca, modelo = NEW.modelo,
+                ubicacion = NEW.ubicacion, responsable = NEW.responsable
+            WHERE id = OLD.equipo_id
+              AND (codigo IS NOT NEW.codigo OR equipo IS NOT NEW.equipo OR marca IS NOT NEW.marca
+                   OR modelo IS NOT NEW.modelo OR ubicacion IS NOT NEW.ubicacion
+                   OR responsable IS NOT NEW.responsable);
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_delete INSTEAD OF DELETE ON {PLAN_TABLE}
+        BEGIN
+            DELETE FROM {TAREAS_TABLE} WHERE id = OLD.id;
+        END""")
+
+
+def _migracion_plan_unico(cur):
+    """
+    v5: una sola fila por (equipo, fecha tentativa), para que guardar el plan dos veces no duplique.
+    Entre duplicados existentes se conserva la cumplida y, a igualdad, la más antigua.
+    """
+    cur.execute(f"""
+        DELETE FROM {TAREAS_TABLE}
+        WHERE fecha_tentativa IS NOT NULL
+          AND id NOT IN (
+              SELECT (SELECT t2.id FROM {TAREAS_TABLE} t2
+                      WHERE t2.equipo_id = t.equipo_id AND t2.fecha_tentativa = t.fecha_tentativa
+                      ORDER BY t2.cumplido DESC, t2.id LIMIT 1)
+              FROM {TAREAS_TABLE} t
+              WHERE t.fecha_tentativa IS NOT NULL
+              GROUP BY t.equipo_id, t.fecha_tentativa
+          )""")
+    cur.execute("DROP INDEX IF EXISTS idx_plan_equipo")
+    cur.execute(f"CREATE UNIQUE INDEX ux_plan_equipo_fecha ON {TAREAS_TABLE} (equipo_id, fecha_tentativa)")
+
+
+def _migracion_indices_visor(cur):
+    """v6: índices para ordenar y filtrar el visor del plan por las columnas restantes."""
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_equipos_equipo ON {EQUIPOS_TABLE} (equipo)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_equipos_responsable ON {EQUIPOS_TABLE} (responsable, ubicacion)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_plan_fecha_cumplimiento ON {TAREAS_TABLE} (fecha_cumplimiento)")
+
+
+def _migracion_papelera(cur):
+    """v7: papelera (tombstones) para deshacer eliminaciones masivas del plan."""
+    cur.execute(f"""
+        CREATE TABLE {PAPELERA_TABLE} (
+            lote INTEGER NOT NULL,
+            eliminado_en TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            equipo_id INTEGER,
+            fecha_tentativa TEXT,
+            cumplido INTEGER,
+            fecha_cumplimiento TEXT,
+            ultimo_mantenimiento TEXT,
+            frecuencia_meses INTEGER
+        )""")
+    cur.execute(f"CREATE INDEX idx_papelera_lote ON {PAPELERA_TABLE} (lote)")
+
+
+def _migracion_origen(cur):
+    """v8: archivo (y hoja) de donde se importó cada equipo, para las importaciones por lotes."""
+    cur.execute(f"ALTER TABLE {EQUIPOS_TABLE} ADD COLUMN origen TEXT")
+
+
+def _migracion_inventario(cur):
+    """
+    v9: datos de inventario en el maestro (frecuencia, último mantenimiento), huella de la fila importada
+    y marca de baja, para las reimportaciones incrementales. Se copian los valores de la tarea más reciente.
+    """
+    cur.execute(f"ALTER TABLE {EQUIPOS_TABLE} ADD COLUMN frecuencia_meses INTEGER")
+    cur.execute(f"ALTER TABLE {EQUIPOS_TABLE} ADD COLUMN ultimo_mantenimiento TEXT")
+    cur.execute(f"ALTER TABLE {EQUIPOS_TABLE} ADD COLUMN hash INTEGER")
+    cur.execute(f"ALTER TABLE {EQUIPOS_TABLE} ADD COLUMN retirado INTEGER NOT NULL DEFAULT 0")
+    cur.execute(f"""
+        UPDATE {EQUIPOS_TABLE} AS e SET
+            frecuencia_meses = t.frecuencia_meses, ultimo_mantenimiento = t.ultimo_mantenimiento
+        FROM (
+            SELECT equipo_id, frecuencia_meses, ultimo_mantenimiento, MAX(id)
+            FROM {TAREAS_TABLE}
+            WHERE frecuencia_meses IS NOT NULL OR ultimo_mantenimiento IS NOT NULL
+            GROUP BY equipo_id
+        ) AS t
+        WHERE e.id = t.equipo_id""")
+
+
+def _migracion_proximo(cur):
+    """
+    v10: próximo mantenimiento del equipo como columna generada (último + frecuencia) con índice, así
+    "qué vence en los próximos N días" es un rango sobre idx_equipos_proximo. Al marcar cumplida una tarea,
+    un trigger adelanta el último mantenimiento del equipo (nunca lo atrasa). La vista del plan pasa a
+    mostrar último, frecuencia y próximo del maestro de equipos.
+    """
+    cur.execute(f"""
+        ALTER TABLE {EQUIPOS_TABLE} ADD COLUMN proximo_mantenimiento TEXT
+        GENERATED ALWAYS AS ({sql_proximo("ultimo_mantenimiento", "frecuencia_meses")}) VIRTUAL""")
+    cur.execute(f"CREATE INDEX idx_equipos_proximo ON {EQUIPOS_TABLE} (retirado, proximo_mantenimiento)")
+    cur.execute(f"""
+        CREATE TRIGGER {TAREAS_TABLE}_cumplida
+        AFTER UPDATE OF cumplido, fecha_cumplimiento ON {TAREAS_TABLE}
+        WHEN NEW.cumplido = 1 AND NEW.fecha_cumplimiento IS NOT NULL
+        BEGIN
+            UPDATE {EQUIPOS_TABLE} SET ultimo_mantenimiento = NEW.fecha_cumplimiento
+            WHERE id = NEW.equipo_id
+              AND (ultimo_mantenimiento IS NULL OR ultimo_mantenimiento < NEW.fecha_cumplimiento);
+        END""")
+    cur.execute(f"""
+        UPDATE {EQUIPOS_TABLE} AS e SET ultimo_mantenimiento = t.fecha
+        FROM (
+            SELECT equipo_id, MAX(fecha_cumplimiento) AS fecha FROM {TAREAS_TABLE}
+            WHERE cumplido = 1 AND fecha_cumplimiento IS NOT NULL
+            GROUP BY equipo_id
+        ) AS t
+        WHERE e.id = t.equipo_id
+          AND (e.ultimo_mantenimiento IS NULL OR e.ultimo_mantenimiento < t.fecha)""")
+
+    cur.execute(f"DROP VIEW {PLAN_TABLE}")                                                          # Se lleva consigo sus triggers
+    cur.execute(f"""
+        CREATE VIEW {PLAN_TABLE} AS
+        SELECT t.id, e.equipo, e.marca, e.modelo, e.codigo, e.ubicacion, e.responsable,
+               t.fecha_tentativa, t.cumplido, t.fecha_cumplimiento,
+               e.ultimo_mantenimiento, e.frecuencia_meses, t.equipo_id, e.proximo_mantenimiento
+        FROM {TAREAS_TABLE} t
+        JOIN {EQUIPOS_TABLE} e ON e.id = t.equipo_id""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_insert INSTEAD OF INSERT ON {PLAN_TABLE}
+        BEGIN
+            INSERT INTO {EQUIPOS_TABLE}
+                (codigo, equipo, marca, modelo, ubicacion, responsable, ultimo_mantenimiento, frecuencia_meses)
+            VALUES (NEW.codigo, NEW.equipo, NEW.marca, NEW.modelo, NEW.ubicacion, NEW.responsable,
+                    NEW.ultimo_mantenimiento, NEW.frecuencia_meses)
+            ON CONFLICT (codigo) DO UPDATE SET
+                equipo = excluded.equipo, marca = excluded.marca, modelo = excluded.modelo,
+                ubicacion = excluded.ubicacion, responsable = excluded.responsable,
+                ultimo_mantenimiento = COALESCE(excluded.ultimo_mantenimiento, ultimo_mantenimiento),
+                frecuencia_meses = COALESCE(excluded.frecuencia_meses, frecuencia_meses);
+            INSERT INTO {TAREAS_TABLE} (equipo_id, fecha_tentativa, cumplido, fecha_cumplimiento)
+            VALUES ((SELECT id FROM {EQUIPOS_TABLE} WHERE codigo = NEW.codigo), NEW.fecha_tentativa,
+                    COALESCE(NEW.cumplido, 0), NEW.fecha_cumplimiento);
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_update INSTEAD OF UPDATE ON {PLAN_TABLE}
+        BEGIN
+            UPDATE {TAREAS_TABLE} SET
+                fecha_tentativa = NEW.fecha_tentativa, cumplido = NEW.cumplido,
+                fecha_cumplimiento = NEW.fecha_cumplimiento
+            WHERE id = OLD.id;
+            UPDATE {EQUIPOS_TABLE} SET
+                codigo = NEW.codigo, equipo = NEW.equipo, marca = NEW.marca, modelo = NEW.modelo,
+                ubicacion = NEW.ubicacion, responsable = NEW.responsable,
+                ultimo_mantenimiento = NEW.ultimo_mantenimiento, frecuencia_meses = NEW.frecuencia_meses
+            WHERE id = OLD.equipo_id
+              AND (codigo IS NOT NEW.codigo OR equipo IS NOT NEW.equipo OR marca IS NOT NEW.marca
+                   OR modelo IS NOT NEW.modelo OR ubicacion IS NOT NEW.ubicacion
+                   OR responsable IS NOT NEW.responsable
+                   OR ultimo_mantenimiento IS NOT NEW.ultimo_mantenimiento
+                   OR frecuencia_meses IS NOT NEW.frecuencia_meses);
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_delete INSTEAD OF DELETE ON {PLAN_TABLE}
+        BEGIN
+            DELETE FROM {TAREAS_TABLE} WHERE id = OLD.id;
+        END""")
+
+
+def _migracion_eventos(cur):
+    """
+    v11: historial de mantenimientos que solo se agrega (no admite UPDATE ni DELETE). Los triggers de
+    TAREAS_TABLE registran un evento "cumplido" al marcar una tarea y uno "anulado" (con la fecha que se
+    anula) al desmarcarla o cambiarle la fecha, dentro de la misma transacción que el guardado. Cada evento
+    mueve el último mantenimiento del equipo: "cumplido" lo adelanta (y guarda el valor anterior); "anulado",
+    si era esa fecha, lo vuelve al mayor entre ese valor anterior y los demás cumplidos vigentes (nunca a NULL:
+    si no hay ninguno, queda como estaba). Se carga el historial con las tareas ya cumplidas; su valor anterior
+    es el último mantenimiento que guardaba la tarea (v4 a v8) o, si no lo tiene, el cumplimiento previo del equipo.
+    """
+    cur.execute(f"""
+        CREATE TABLE {EVENTOS_TABLE} (
+            id INTEGER PRIMARY KEY,
+            equipo_id INTEGER NOT NULL REFERENCES {EQUIPOS_TABLE}(id),
+            tarea_id INTEGER,
+            fecha TEXT NOT NULL,
+            tipo TEXT NOT NULL CHECK (tipo IN ('cumplido', 'anulado')),
+            ultimo_anterior TEXT,
+            registrado_en TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )""")
+    cur.execute(f"CREATE INDEX idx_eventos_equipo_fecha ON {EVENTOS_TABLE} (equipo_id, fecha)")
+    cur.execute(f"""
+        INSERT INTO {EVENTOS_TABLE} (equipo_id, tarea_id, fecha, tipo, ultimo_anterior, registrado_en)
+        SELECT t.equipo_id, t.id, t.fecha_cumplimiento, 'cumplido',
+               COALESCE(t.ultimo_mantenimiento, (
+                   SELECT MAX(p.fecha_cumplimiento) FROM {TAREAS_TABLE} p
+                   WHERE p.equipo_id = t.equipo_id AND p.cumplido = 1 AND p.fecha_cumplimiento < t.fecha_cumplimiento
+               )),
+               t.fecha_cumplimiento
+        FROM {TAREAS_TABLE} t
+        WHERE t.cumplido = 1 AND t.fecha_cumplimiento IS NOT NULL
+        ORDER BY t.fecha_cumplimiento, t.id""")
+
+    for operacion in ("UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER {EVENTOS_TABLE}_sin_{operacion.lower()} BEFORE {operacion} ON {EVENTOS_TABLE}
+            BEGIN
+                SELECT RAISE(ABORT, 'El historial de mantenimientos no se modifica');
+            END""")
+    cur.execute(f"""
+        CREATE TRIGGER {EVENTOS_TABLE}_cumplido AFTER INSERT ON {EVENTOS_TABLE}
+        WHEN NEW.tipo = 'cumplido'
+        BEGIN
+            UPDATE {EQUIPOS_TABLE} SET ultimo_mantenimiento = NEW.fecha
+            WHERE id = NEW.equipo_id AND (ultimo_mantenimiento IS NULL OR ultimo_mantenimiento < NEW.fecha);
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {EVENTOS_TABLE}_anulado AFTER INSERT ON {EVENTOS_TABLE}
+        WHEN NEW.tipo = 'anulado'
+        BEGIN
+            UPDATE {EQUIPOS_TABLE} SET ultimo_mantenimiento = COALESCE((
+                SELECT MAX(f) FROM (
+                    SELECT c.fecha AS f FROM {EVENTOS_TABLE} c
+                    WHERE c.equipo_id = NEW.equipo_id AND c.tipo = 'cumplido'
+                      AND NOT EXISTS (
+                          SELECT 1 FROM {EVENTOS_TABLE} a
+                          WHERE a.equipo_id = c.equipo_id AND a.tipo = 'anulado' AND a.id > c.id
+                            AND a.fecha = c.fecha AND a.tarea_id IS c.tarea_id
+                      )
+                    UNION ALL
+                    SELECT * FROM (
+                        SELECT c.ultimo_anterior FROM {EVENTOS_TABLE} c
+                        WHERE c.equipo_id = NEW.equipo_id AND c.tipo = 'cumplido'
+                          AND c.fecha = NEW.fecha AND c.tarea_id IS NEW.tarea_id
+                        ORDER BY c.id DESC LIMIT 1
+                    )
+                )
+            ), ultimo_mantenimiento)
+            WHERE id = NEW.equipo_id AND ultimo_mantenimiento = NEW.fecha;
+        END""")
+
+    # Las tareas dejan de mover el equipo directamente: lo hacen a través del historial
+    cur.execute(f"DROP TRIGGER {TAREAS_TABLE}_cumplida")
+    cur.execute(f"""
+        CREATE TRIGGER {TAREAS_TABLE}_anulada
+        AFTER UPDATE OF cumplido, fecha_cumplimiento ON {TAREAS_TABLE}
+        WHEN OLD.cumplido = 1 AND OLD.fecha_cumplimiento IS NOT NULL
+         AND (NEW.cumplido IS NOT 1 OR NEW.fecha_cumplimiento IS NOT OLD.fecha_cumplimiento)
+        BEGIN
+            INSERT INTO {EVENTOS_TABLE} (equipo_id, tarea_id, fecha, tipo)
+            VALUES (OLD.equipo_id, OLD.id, OLD.fecha_cumplimiento, 'anulado');
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {TAREAS_TABLE}_cumplida
+        AFTER UPDATE OF cumplido, fecha_cumplimiento ON {TAREAS_TABLE}
+        WHEN NEW.cumplido = 1 AND NEW.fecha_cumplimiento IS NOT NULL
+         AND (OLD.cumplido IS NOT 1 OR OLD.fecha_cumplimiento IS NOT NEW.fecha_cumplimiento)
+        BEGIN
+            INSERT INTO {EVENTOS_TABLE} (equipo_id, tarea_id, fecha, tipo, ultimo_anterior)
+            VALUES (NEW.equipo_id, NEW.id, NEW.fecha_cumplimiento, 'cumplido',
+                    (SELECT ultimo_mantenimiento FROM {EQUIPOS_TABLE} WHERE id = NEW.equipo_id));
+        END""")
+
+
+def _migracion_busqueda(cur):
+    """
+    v12: índice FTS5 de contenido externo sobre el maestro de equipos (sin duplicar los textos), con
+    triggers que lo mantienen al día. Los UPDATE que solo tocan fechas o la baja no lo reescriben.
+    """
+    cols = ", ".join(COLS_BUSQUEDA)
+    nuevos = ", ".join(f"NEW.{c}" for c in COLS_BUSQUEDA)
+    viejos = ", ".join(f"OLD.{c}" for c in COLS_BUSQUEDA)
+    cur.execute(f"""
+        CREATE VIRTUAL TABLE {BUSQUEDA_TABLE} USING fts5(
+            {cols}, content='{EQUIPOS_TABLE}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""")
+    cur.execute(f"INSERT INTO {BUSQUEDA_TABLE} ({BUSQUEDA_TABLE}) VALUES ('rebuild')")
+    cur.execute(f"""
+        CREATE TRIGGER {BUSQUEDA_TABLE}_insert AFTER INSERT ON {EQUIPOS_TABLE}
+        BEGIN
+            INSERT INTO {BUSQUEDA_TABLE} (rowid, {cols}) VALUES (NEW.id, {nuevos});
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {BUSQUEDA_TABLE}_delete AFTER DELETE ON {EQUIPOS_TABLE}
+        BEGIN
+            INSERT INTO {BUSQUEDA_TABLE} ({BUSQUEDA_TABLE}, rowid, {cols}) VALUES ('delete', OLD.id, {viejos});
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {BUSQUEDA_TABLE}_update AFTER UPDATE OF {cols} ON {EQUIPOS_TABLE}
+        BEGIN
+            INSERT INTO {BUSQUEDA_TABLE} ({BUSQUEDA_TABLE}, rowid, {cols}) VALUES ('delete', OLD.id, {viejos});
+            INSERT INTO {BUSQUEDA_TABLE} (rowid, {cols}) VALUES (NEW.id, {nuevos});
+        END""")
+
+
+def _migracion_codigo_nocase(cur):
+    """v13: índice del código sin distinguir mayúsculas, para resolver lecturas de lector que no coinciden exacto."""
+    cur.execute(f"CREATE INDEX idx_equipos_codigo_nocase ON {EQUIPOS_TABLE} (codigo COLLATE NOCASE)")
+
+
+def _migracion_vista_plan(cur):
+    """
+    v14: la vista del plan expone la baja del equipo (retirado), para que resumen y ventanas muestren solo
+    equipos vigentes, y sus triggers anulan la huella (hash) del equipo que modifican, igual que
+    _upsert_equipos, para que una reimportación no dé por iguales datos editados desde el plan.
+    Una fila sin código (NULL o vacío) no se fusiona con otras: su equipo se identifica como "#" + id de la
+    tarea, la misma clave que usó la v4 (el id es el siguiente de AUTOINCREMENT); al editar, un código vacío
+    conserva el anterior.
+    """
+    cur.execute(f"DROP VIEW {PLAN_TABLE}")                                                          # Se lleva consigo sus triggers
+    _crear_vista_plan(cur)
+
+
+def _crear_vista_plan(cur):
+    """Crea la vista del plan y sus triggers INSTEAD OF en su forma actual (v14); la vista no debe existir."""
+    clave = (
+        f"COALESCE(NULLIF(TRIM(NEW.codigo), ''), "
+        f"'#' || (COALESCE((SELECT seq FROM sqlite_sequence WHERE name = '{TAREAS_TABLE}'), 0) + 1))"
+    )
+    cur.execute(f"""
+        CREATE VIEW {PLAN_TABLE} AS
+        SELECT t.id, e.equipo, e.marca, e.modelo, e.codigo, e.ubicacion, e.responsable,
+               t.fecha_tentativa, t.cumplido, t.fecha_cumplimiento,
+               e.ultimo_mantenimiento, e.frecuencia_meses, t.equipo_id, e.proximo_mantenimiento, e.retirado
+        FROM {TAREAS_TABLE} t
+        JOIN {EQUIPOS_TABLE} e ON e.id = t.equipo_id""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_insert INSTEAD OF INSERT ON {PLAN_TABLE}
+        BEGIN
+            INSERT INTO {EQUIPOS_TABLE}
+                (codigo, equipo, marca, modelo, ubicacion, responsable, ultimo_mantenimiento, frecuencia_meses)
+            VALUES ({clave}, NEW.equipo, NEW.marca, NEW.modelo, NEW.ubicacion, NEW.responsable,
+                    NEW.ultimo_mantenimiento, NEW.frecuencia_meses)
+            ON CONFLICT (codigo) DO UPDATE SET
+                equipo = excluded.equipo, marca = excluded.marca, modelo = excluded.modelo,
+                ubicacion = excluded.ubicacion, responsable = excluded.responsable,
+                ultimo_mantenimiento = COALESCE(excluded.ultimo_mantenimiento, ultimo_mantenimiento),
+                frecuencia_meses = COALESCE(excluded.frecuencia_meses, frecuencia_meses),
+                hash = NULL;
+            INSERT INTO {TAREAS_TABLE} (equipo_id, fecha_tentativa, cumplido, fecha_cumplimiento)
+            VALUES ((SELECT id FROM {EQUIPOS_TABLE} WHERE codigo = {clave}), NEW.fecha_tentativa,
+                    COALESCE(NEW.cumplido, 0), NEW.fecha_cumplimiento);
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_update INSTEAD OF UPDATE ON {PLAN_TABLE}
+        BEGIN
+            UPDATE {TAREAS_TABLE} SET
+                fecha_tentativa = NEW.fecha_tentativa, cumplido = NEW.cumplido,
+                fecha_cumplimiento = NEW.fecha_cumplimiento
+            WHERE id = OLD.id;
+            UPDATE {EQUIPOS_TABLE} SET
+                codigo = COALESCE(NULLIF(TRIM(NEW.codigo), ''), codigo), equipo = NEW.equipo, marca = NEW.marca,
+                modelo = NEW.modelo, ubicacion = NEW.ubicacion, responsable = NEW.responsable,
+                ultimo_mantenimiento = NEW.ultimo_mantenimiento, frecuencia_meses = NEW.frecuencia_meses,
+                hash = NULL
+            WHERE id = OLD.equipo_id
+              AND (codigo IS NOT COALESCE(NULLIF(TRIM(NEW.codigo), ''), codigo) OR equipo IS NOT NEW.equipo OR marca IS NOT NEW.marca
+                   OR modelo IS NOT NEW.modelo OR ubicacion IS NOT NEW.ubicacion
+                   OR responsable IS NOT NEW.responsable
+                   OR ultimo_mantenimiento IS NOT NEW.ultimo_mantenimiento
+                   OR frecuencia_meses IS NOT NEW.frecuencia_meses);
+        END""")
+    cur.execute(f"""
+        CREATE TRIGGER {PLAN_TABLE}_delete INSTEAD OF DELETE ON {PLAN_TABLE}
+        BEGIN
+            DELETE FROM {TAREAS_TABLE} WHERE id = OLD.id;
+        END""")
+
+
+def _migracion_proximo_sin_frecuencia(cur):
+    """
+    v15: el próximo mantenimiento es NULL si falta la frecuencia (antes daba una fecha del mes anterior al
+    último mantenimiento). Una columna generada no se puede modificar: se quitan la vista y el índice que la
+    usan, se vuelve a crear con sql_proximo corregido y se reconstruyen índice y vista.
+    """
+    cur.execute(f"DROP VIEW {PLAN_TABLE}")                                                          # Se lleva consigo sus triggers
+    cur.execute("DROP INDEX idx_equipos_proximo")
+    cur.execute(f"ALTER TABLE {EQUIPOS_TABLE} DROP COLUMN proximo_mantenimiento")
+    cur.execute(f"""
+        ALTER TABLE {EQUIPOS_TABLE} ADD COLUMN proximo_mantenimiento TEXT
+        GENERATED ALWAYS AS ({sql_proximo("ultimo_mantenimiento", "frecuencia_meses")}) VIRTUAL""")
+    cur.execute(f"CREATE INDEX idx_equipos_proximo ON {EQUIPOS_TABLE} (retirado, proximo_mantenimiento)")
+    _crear_vista_plan(cur)
+
+
+MIGRACIONES = [                                                                                     # El índice + 1 es la versión que deja cada migración
+    _migracion_columnas,
+    _migracion_indices,
+    _migracion_fechas_iso,
+    _migracion_equipos,
+    _migracion_plan_unico,
+    _migracion_indices_visor,
+    _migracion_papelera,
+    _migracion_origen,
+    _migracion_inventario,
+    _migracion_proximo,
+    _migracion_eventos,
+    _migracion_busqueda,
+    _migracion_codigo_nocase,
+    _migracion_vista_plan,
+    _migracion_proximo_sin_frecuencia,
+]
+SCHEMA_VERSION = len(MIGRACIONES)
+
+_migradas = set()                                                                                   # Rutas ya verificadas en este proceso
+
+
+def ensure_table(db_path: str):                                                                     # Defino la función: ensure_table, que toma como argumento: db_path 
+    """Lleva la BD a SCHEMA_VERSION. Tras la primera llamada por archivo, no toca la BD."""
+    clave = _clave(db_path)
+    if clave in _migradas:
+        return
+    with _lock:
+        if clave in _migradas:
+            return
+        conn = get_connection(db_path)                                                              # Conexión compartida (crea la carpeta si no existe)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            cur = conn.cursor()                                                                     # Función de sqlite3 que permite ejecutar comandos SQL.
+            cur.execute("BEGIN IMMEDIATE")                                                          # Todas las migraciones pendientes en una sola transacción
+            try:
+                for migracion in MIGRACIONES[version:]:
+                    migracion(cur)
+                cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        _migradas.add(clave)
+
+
+# ---------------- Guardado del plan ----------------
+COLS_EQUIPO = ("codigo", "equipo", "marca", "modelo", "ubicacion", "responsable", "origen")
+
+
+COLS_MANTENIMIENTO = ("ultimo_mantenimiento", "frecuencia_meses")                                   # Opcionales en cada fila guardada
+
+
+def _frecuencia(valor):
+    """Meses como entero (None si falta). Lanza ValueError si no es un número."""
+    if valor is None or valor == "" or valor != valor:                                              # valor != valor: NaN
+        return None
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        raise ValueError(f"Frecuencia inválida: {valor!r}") from None
+
+
+def _fila_equipo(fila) -> tuple:
+    """(COLS_EQUIPO..., último mantenimiento ISO, frecuencia) de un dict; ValueError si falta el código."""
+    codigo = str(fila.get("codigo") or "").strip()
+    if not codigo:
+        raise ValueError(f"Equipo sin código: {fila.get('equipo', '')!r}")
+    ultimo = fila.get("ultimo_mantenimiento")
+    if ultimo is not None and ultimo != ultimo:                                                     # NaT de pandas
+        ultimo = None
+    return (codigo,) + tuple(str(fila.get(c) or "") for c in COLS_EQUIPO[1:]) + (
+        fecha_a_iso(ultimo), _frecuencia(fila.get("frecuencia_meses")),
+    )
+
+
+# Origen vacío (fila que no viene de una importación) conserva el que ya tenía el equipo; último
+# mantenimiento y frecuencia vacíos conservan los guardados, y el último mantenimiento nunca retrocede
+# (una planilla vieja no borra un cumplimiento registrado en la aplicación).
+_DISTINTO_EQUIPO = """
+    e.equipo IS NOT n.equipo OR e.marca IS NOT n.marca OR e.modelo IS NOT n.modelo
+    OR e.ubicacion IS NOT n.ubicacion OR e.responsable IS NOT n.responsable
+    OR (n.origen <> '' AND e.origen IS NOT n.origen)
+    OR (n.frecuencia_meses IS NOT NULL AND e.frecuencia_meses IS NOT n.frecuencia_meses)
+    OR n.ultimo_mantenimiento > COALESCE(e.ultimo_mantenimiento, '')
+"""
+
+
+def _upsert_equipos(cur, origen: str) -> None:
+    """
+    Inserta/actualiza EQUIPOS_TABLE desde la tabla temporal origen (COLS_EQUIPO + COLS_MANTENIMIENTO).
+    Las filas que cambian pierden la huella (hash = NULL): ya no son las de la última reimportación, así
+    diferencias_equipos las compara columna por columna.
+    """
+    cur.execute(f"""
+        INSERT INTO {EQUIPOS_TABLE} AS e
+            (codigo, equipo, marca, modelo, ubicacion, responsable, origen, ultimo_mantenimiento, frecuencia_meses)
+        SELECT codigo, equipo, marca, modelo, ubicacion, responsable, NULLIF(origen, ''),
+               ultimo_mantenimiento, frecuencia_meses
+        FROM {origen} AS n WHERE true
+        ON CONFLICT (codigo) DO UPDATE SET
+            equipo = excluded.equipo, marca = excluded.marca, modelo = excluded.modelo,
+            ubicacion = excluded.ubicacion, responsable = excluded.responsable,
+            origen = COALESCE(excluded.origen, e.origen),
+            ultimo_mantenimiento = CASE
+                WHEN excluded.ultimo_mantenimiento > COALESCE(e.ultimo_mantenimiento, '')
+                THEN excluded.ultimo_mantenimiento ELSE e.ultimo_mantenimiento END,
+            frecuencia_meses = COALESCE(excluded.frecuencia_meses, e.frecuencia_meses),
+            hash = NULL
+        WHERE e.equipo IS NOT excluded.equipo OR e.marca IS NOT excluded.marca
+           OR e.modelo IS NOT excluded.modelo OR e.ubicacion IS NOT excluded.ubicacion
+           OR e.responsable IS NOT excluded.responsable
+           OR (excluded.origen IS NOT NULL AND e.origen IS NOT excluded.origen)
+           OR (excluded.frecuencia_meses IS NOT NULL AND e.frecuencia_meses IS NOT excluded.frecuencia_meses)
+           OR excluded.ultimo_mantenimiento > COALESCE(e.ultimo_mantenimiento, '')
+    """)
+
+
+def guardar_plan(db_path, filas) -> dict:
+    """
+    Guarda filas del plan (dicts con COLS_EQUIPO + fecha_tentativa y, opcionales, COLS_MANTENIMIENTO)
+    de forma idempotente:
+    la clave es (código, fecha_tentativa), así que volver a guardar lo mismo no duplica nada.
+    Primero se validan TODAS las fechas (ValueError si alguna es inválida o falta) y luego se escribe
+    en una sola transacción con executemany + UPSERT.
+    Devuelve {"insertados", "actualizados", "omitidos"}.
+    """
+    datos = []
+    for fila in filas:                                                                              # Validación completa antes de tocar la BD
+        equipo = _fila_equipo(fila)
+        fecha = fecha_a_iso(fila.get("fecha_tentativa"))
+        if fecha is None:
+            raise ValueError(f"Falta la fecha tentativa del equipo {equipo[0]}")
+        datos.append(equipo + (fecha,))
+
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    with _lock:
+        cur = conn.cursor()
+        cur.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS plan_nuevo (
+                codigo TEXT, equipo TEXT, marca TEXT, modelo TEXT, ubicacion TEXT, responsable TEXT,
+                origen TEXT, ultimo_mantenimiento TEXT, frecuencia_meses INTEGER, fecha_tentativa TEXT,
+                PRIMARY KEY (codigo, fecha_tentativa)
+            )""")
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute("DELETE FROM plan_nuevo")
+            cur.executemany(                                                                        # Repetidos en la entrada: gana el último
+                "INSERT OR REPLACE INTO plan_nuevo VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", datos
+            )
+            distintos = cur.execute("SELECT COUNT(*) FROM plan_nuevo").fetchone()[0]
+
+            # Filas que ya están en el plan y, de ellas, cuántas traen datos de equipo distintos
+            existentes, cambiadas = cur.execute(f"""
+                SELECT COUNT(*), COALESCE(SUM({_DISTINTO_EQUIPO}), 0)
+                FROM plan_nuevo n
+                JOIN {EQUIPOS_TABLE} e ON e.codigo = n.codigo
+                JOIN {TAREAS_TABLE} t ON t.equipo_id = e.id AND t.fecha_tentativa = n.fecha_tentativa
+            """).fetchone()
+
+            _upsert_equipos(cur, "plan_nuevo")
+            cur.execute(f"""
+                INSERT INTO {TAREAS_TABLE} (equipo_id, fecha_tentativa, cumplido)
+                SELECT e.id, n.fecha_tentativa, 0
+                FROM plan_nuevo n JOIN {EQUIPOS_TABLE} e ON e.codigo = n.codigo
+                WHERE true
+                ON CONFLICT (equipo_id, fecha_tentativa) DO NOTHING
+            """)
+            cur.execute("DELETE FROM plan_nuevo")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return {
+        "insertados": distintos - existentes,
+        "actualizados": cambiadas,
+        "omitidos": len(datos) - distintos + existentes - cambiadas,
+    }
+
+
+def guardar_equipos(db_path, filas) -> dict:
+    """
+    Registra equipos (dicts con COLS_EQUIPO y, opcionales, COLS_MANTENIMIENTO) en el maestro, sin crear tareas del plan, en una sola
+    transacción. Códigos repetidos: gana el último. Devuelve {"insertados", "actualizados", "omitidos"}.
+    """
+    datos = [_fila_equipo(fila) for fila in filas]
+
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    with _lock:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS equipos_nuevos (
+                codigo TEXT PRIMARY KEY, equipo TEXT, marca TEXT, modelo TEXT, ubicacion TEXT,
+                responsable TEXT, origen TEXT, ultimo_mantenimiento TEXT, frecuencia_meses INTEGER
+            )""")
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute("DELETE FROM equipos_nuevos")
+            cur.executemany("INSERT OR REPLACE INTO equipos_nuevos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", datos)
+            distintos = cur.execute("SELECT COUNT(*) FROM equipos_nuevos").fetchone()[0]
+            existentes, cambiadas = cur.execute(f"""
+                SELECT COUNT(*), COALESCE(SUM({_DISTINTO_EQUIPO}), 0)
+                FROM equipos_nuevos n JOIN {EQUIPOS_TABLE} e ON e.codigo = n.codigo
+            """).fetchone()
+            _upsert_equipos(cur, "equipos_nuevos")
+            cur.execute("DELETE FROM equipos_nuevos")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return {
+        "insertados": distintos - existentes,
+        "actualizados": cambiadas,
+        "omitidos": len(datos) - distintos + existentes - cambiadas,
+    }
+
+
+# ---------------- Consultas paginadas ----------------
+def valores_distintos(db_path, columna: str) -> list:
+    """Valores distintos de una columna entre los equipos vigentes (p. ej. ubicacion), ordenados."""
+    if columna not in COLS_EQUIPO:
+        raise ValueError(f"Columna desconocida: {columna}")
+    conn = get_connection(db_path)
+    return [
+        r[0] for r in conn.execute(
+            f"SELECT DISTINCT {columna} FROM {EQUIPOS_TABLE} "
+            f"WHERE retirado = 0 AND {columna} IS NOT NULL ORDER BY {columna}"
+        )
+    ]
+
+
+def consulta_fts(texto) -> str:
+    """
+    Texto libre -> consulta MATCH de FTS5: cada palabra es un prefijo y deben estar todas
+    ("ab12 lab" -> '"ab12"* "lab"*'). Las comillas evitan que guiones o paréntesis se lean como operadores.
+    """
+    return " ".join('"{}"*'.format(t.replace('"', '""')) for t in str(texto or "").split())
+
+
+def buscar_equipos(db_path, texto, limite=20) -> list:
+    """
+    Equipos vigentes que coinciden con texto (prefijos en equipo, marca, modelo, código, ubicación o
+    responsable), los más relevantes primero (bm25). Devuelve [(id, codigo, equipo, marca, modelo, ubicacion)].
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return []
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    return conn.execute(f"""
+        SELECT e.id, e.codigo, e.equipo, e.marca, e.modelo, e.ubicacion
+        FROM {BUSQUEDA_TABLE} f JOIN {EQUIPOS_TABLE} e ON e.id = f.rowid
+        WHERE {BUSQUEDA_TABLE} MATCH ? AND e.retirado = 0
+        ORDER BY f.rank
+        LIMIT ?""", (consulta, int(limite))).fetchall()
+
+
+def filtros_plan(texto="", ubicacion="", responsable="", cumplido=None, desde=None, hasta=None, vigentes=True) -> list:
+    """
+    Arma los filtros [(sql, params)] para ConsultaPaginada sobre PLAN_TABLE.
+    texto: búsqueda por prefijos en el índice FTS5 de equipos; desde/hasta: fechas (dd/mm/yyyy o ISO)
+    sobre fecha_tentativa; cumplido: None, 0 o 1; vigentes: excluir equipos dados de baja en una reimportación.
+    """
+    filtros = [("retirado = 0", [])] if vigentes else []
+    consulta = consulta_fts(texto)
+    if consulta:
+        filtros.append((f"equipo_id IN (SELECT rowid FROM {BUSQUEDA_TABLE} WHERE {BUSQUEDA_TABLE} MATCH ?)", [consulta]))
+    if ubicacion:
+        filtros.append(("ubicacion = ?", [ubicacion]))
+    if responsable:
+        filtros.append(("responsable = ?", [responsable]))
+    if cumplido is not None:
+        filtros.append(("cumplido = ?", [int(cumplido)]))
+    desde, hasta = fecha_a_iso(desde), fecha_a_iso(hasta)
+    if desde:
+        filtros.append(("fecha_tentativa >= ?", [desde]))
+    if hasta:
+        filtros.append(("fecha_tentativa <= ?", [hasta]))
+    return filtros
+
+
+class ConsultaPaginada:
+    """
+    Lectura por páginas de PLAN_TABLE con paginación por clave (keyset): cada página continúa
+    desde el último (valor de orden, id) visto, así el costo no crece con la página en la que se está.
+    El orden y los filtros se resuelven en SQLite (ORDER BY / WHERE sobre columnas indexadas).
+
+    columnas: nombres de columnas de la vista; la primera debe ser "id".
+    expresiones: {columna: expresión SQL} opcional para mostrar (p. ej. fechas en dd/mm/yyyy).
+    """
+
+    def __init__(self, db_path, columnas, expresiones=None, tabla=PLAN_TABLE, tam_pagina=200):
+        if columnas[0] != "id":
+            raise ValueError("La primera columna debe ser 'id'")
+        self.db_path = db_path
+        self.columnas = list(columnas)
+        self.expresiones = expresiones or {}
+        self.tabla = tabla
+        self.tam_pagina = tam_pagina
+        self.orden = "id"
+        self.descendente = False
+        self.filtros = []                                                                           # [(sql, params)]
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._ultimo = None                                                                         # (valor de orden, id) de la última fila entregada
+        self.agotada = False
+
+    def ordenar(self, columna, descendente=None):
+        """Ordena por columna; si ya era la columna de orden y no se indica sentido, lo invierte."""
+        if columna not in self.columnas:
+            raise ValueError(f"Columna desconocida: {columna}")
+        if descendente is None:
+            descendente = (not self.descendente) if columna == self.orden else False
+        self.orden, self.descendente = columna, descendente
+        self.reiniciar()
+
+    def filtrar(self, filtros):
+        self.filtros = list(filtros)
+        self.reiniciar()
+
+    def _where(self):
+        condiciones = [sql for sql, _ in self.filtros]
+        params = [p for _, ps in self.filtros for p in ps]
+        return condiciones, params
+
+    def contar(self) -> int:
+        condiciones, params = self._where()
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        conn = get_connection(self.db_path)
+        return conn.execute(f"SELECT COUNT(*) FROM {self.tabla} {where}", params).fetchone()[0]
+
+    def _keyset(self):
+        """Condición para continuar después de self._ultimo. SQLite ordena los NULL primero en ASC."""
+        valor, _id = self._ultimo
+        col = self.orden
+        if self.orden == "id":
+            return (f"id < ?" if self.descendente else f"id > ?"), [_id]
+        if not self.descendente:
+            if valor is None:
+                return f"(({col} IS NULL AND id > ?) OR {col} IS NOT NULL)", [_id]
+            return f"({col} > ? OR ({col} = ? AND id > ?))", [valor, valor, _id]
+        if valor is None:
+            return f"({col} IS NULL AND id < ?)", [_id]
+        return f"({col} < ? OR ({col} = ? AND id < ?) OR {col} IS NULL)", [valor, valor, _id]
+
+    def siguiente(self) -> list:
+        """Devuelve la próxima página (lista de tuplas con las columnas pedidas) o [] si no hay más."""
+        if self.agotada:
+            return []
+        condiciones, params = self._where()
+        if self._ultimo is not None:
+            cond, ps = self._keyset()
+            condiciones.append(cond)
+            params.extend(ps)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        sentido = "DESC" if self.descendente else "ASC"
+        orden = "id" if self.orden == "id" else f"{self.orden} {sentido}, id"
+        # Sin alias: en ORDER BY un alias con el nombre de la columna taparía a la columna real
+        select = ", ".join(self.expresiones.get(c, c) for c in self.columnas)
+
+        conn = get_connection(self.db_path)
+        filas = conn.execute(
+            f"SELECT {select}, {self.orden} FROM {self.tabla} {where} "
+            f"ORDER BY {orden} {sentido} LIMIT ?",
+            params + [self.tam_pagina],
+        ).fetchall()
+
+        if len(filas) < self.tam_pagina:
+            self.agotada = True
+        if filas:
+            self._ultimo = (filas[-1][-1], filas[-1][0])
+        return [f[:-1] for f in filas]
+
+
+# ---------------- Eliminación con deshacer ----------------
+def _columnas_tarea(cur) -> str:
+    cur.execute(f"PRAGMA table_info({TAREAS_TABLE})")
+    return ", ".join(r[1] for r in cur.fetchall())
+
+
+def eliminar_plan(db_path, ids) -> tuple:
+    """
+    Elimina las filas del plan con esos ids en una sola sentencia (conjunto vía json_each) y
+    las guarda en PAPELERA_TABLE. Devuelve (lote, eliminados); el lote sirve para deshacer.
+    """
+    ids_json = json.dumps([int(i) for i in ids])
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    with _lock:
+        cur = conn.cursor()
+        cols = _columnas_tarea(cur)
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            lote = cur.execute(f"SELECT COALESCE(MAX(lote), 0) + 1 FROM {PAPELERA_TABLE}").fetchone()[0]
+            cur.execute(
+                f"""
+                INSERT INTO {PAPELERA_TABLE} (lote, eliminado_en, {cols})
+                SELECT ?, datetime('now', 'localtime'), {cols} FROM {TAREAS_TABLE}
+                WHERE id IN (SELECT value FROM json_each(?))
+                """,
+                (lote, ids_json),
+            )
+            cur.execute(f"DELETE FROM {TAREAS_TABLE} WHERE id IN (SELECT value FROM json_each(?))", (ids_json,))
+            eliminados = cur.rowcount
+            cur.execute(f"DELETE FROM {PAPELERA_TABLE} WHERE lote <= ?", (lote - MAX_LOTES_PAPELERA,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return lote, eliminados
+
+
+def deshacer_eliminacion(db_path, lote=None) -> int:
+    """
+    Restaura las filas del lote indicado (o del último) y las quita de la papelera. Devuelve cuántas volvieron.
+    Si mientras tanto se volvió a guardar el mismo (equipo, fecha), se conserva la fila nueva y, si la borrada
+    estaba cumplida y la nueva no, se le pasa el cumplimiento. Solo salen de la papelera las filas restauradas
+    o cuyo cumplimiento ya quedó en la fila nueva; las demás siguen ahí.
+    """
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    with _lock:
+        cur = conn.cursor()
+        cols = _columnas_tarea(cur)
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            if lote is None:
+                lote = cur.execute(f"SELECT MAX(lote) FROM {PAPELERA_TABLE}").fetchone()[0]
+            # OR IGNORE: si mientras tanto se volvió a guardar el mismo (equipo, fecha), se conserva el nuevo
+            cur.execute(
+                f"INSERT OR IGNORE INTO {TAREAS_TABLE} ({cols}) SELECT {cols} FROM {PAPELERA_TABLE} WHERE lote = ?",
+                (lote,),
+            )
+            restaurados = cur.rowcount
+            cur.execute(f"""
+                UPDATE {TAREAS_TABLE} SET cumplido = 1, fecha_cumplimiento = p.fecha_cumplimiento
+                FROM {PAPELERA_TABLE} AS p
+                WHERE p.lote = ? AND p.cumplido = 1 AND p.id <> {TAREAS_TABLE}.id
+                  AND {TAREAS_TABLE}.equipo_id = p.equipo_id AND {TAREAS_TABLE}.fecha_tentativa = p.fecha_tentativa
+                  AND {TAREAS_TABLE}.cumplido = 0""", (lote,))
+            cur.execute(f"""
+                DELETE FROM {PAPELERA_TABLE}
+                WHERE lote = ?
+                  AND (id IN (SELECT id FROM {TAREAS_TABLE})
+                       OR EXISTS (
+                           SELECT 1 FROM {TAREAS_TABLE} t
+                           WHERE t.equipo_id = {PAPELERA_TABLE}.equipo_id
+                             AND t.fecha_tentativa = {PAPELERA_TABLE}.fecha_tentativa
+                             AND (t.cumplido = 1 OR COALESCE({PAPELERA_TABLE}.cumplido, 0) = 0)
+                       ))""", (lote,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return restaurados
+
+
+# ---------------- Cumplimientos por lote ----------------
+def guardar_cumplimientos(db_path, marcar=(), desmarcar=(), fecha=None) -> int:
+    """
+    Aplica solo los cambios de la ventana de cumplimiento, en una transacción con executemany:
+    marcar: ids que pasan a cumplido (fecha de cumplimiento = fecha o hoy); desmarcar: ids que vuelven a pendiente.
+    Las tareas que ya estaban en ese estado no se tocan, así no se pisa una fecha de cumplimiento real.
+    Los triggers de la v11 registran cada cambio en EVENTOS_TABLE en la misma transacción.
+    Devuelve cuántas filas cambiaron.
+    """
+    fecha = fecha_a_iso(fecha) or dt.date.today().isoformat()
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    with _lock:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.executemany(
+                f"UPDATE {TAREAS_TABLE} SET cumplido = 1, fecha_cumplimiento = ? WHERE id = ? AND cumplido = 0",
+                [(fecha, int(i)) for i in marcar],
+            )
+            cambiadas = cur.rowcount
+            cur.executemany(
+                f"UPDATE {TAREAS_TABLE} SET cumplido = 0, fecha_cumplimiento = NULL WHERE id = ? AND cumplido = 1",
+                [(int(i),) for i in desmarcar],
+            )
+            cambiadas += cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return cambiadas
+
+
+def _lecturas(registros, hoy):
+    """(código, fecha ISO) de cada registro con código; ValueError con el código si la fecha no es válida."""
+    for codigo, fecha in registros:
+        codigo = str(codigo or "").strip()
+        if not codigo:
+            continue
+        try:
+            yield codigo, fecha_a_iso(fecha) or hoy
+        except ValueError as e:
+            raise ValueError(f"Código {codigo}: {e}") from None
+
+
+def marcar_cumplidos(db_path, registros) -> dict:
+    """
+    Marca como cumplidos los mantenimientos de una lista de (código, fecha de cumplimiento); fecha vacía = hoy.
+    registros puede ser un generador (p. ej. importacion.iter_cumplimientos): se vuelca directo a una tabla
+    temporal con executemany, sin armar la lista en memoria.
+    Cada código se resuelve con el índice único de códigos y, si no coincide exacto, sin distinguir
+    mayúsculas (idx_equipos_codigo_nocase); si así coincide con más de un equipo, es ambiguo y no se marca.
+    Por cada equipo se marca su tarea pendiente más antigua (menor fecha_tentativa). Si un código se repite,
+    gana la última fecha. Todo se aplica en una sola transacción; una fecha inválida (ValueError) no deja nada escrito.
+    Devuelve {"marcados", "desconocidos": [códigos sin equipo], "ambiguos": [códigos con varios equipos],
+    "sin_pendientes": [códigos sin tarea pendiente]}.
+    """
+    hoy = dt.date.today().isoformat()
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    with _lock:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS cumplidos_nuevos (
+                codigo TEXT PRIMARY KEY, fecha TEXT, equipo_id INTEGER, coincidencias INTEGER
+            )""")
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute("DELETE FROM cumplidos_nuevos")
+            cur.executemany(
+                "INSERT OR REPLACE INTO cumplidos_nuevos (codigo, fecha) VALUES (?, ?)", _lecturas(registros, hoy)
+            )
+            cur.execute(f"""
+                UPDATE cumplidos_nuevos SET equipo_id = e.id, coincidencias = 1
+                FROM {EQUIPOS_TABLE} e WHERE e.codigo = cumplidos_nuevos.codigo""")
+            cur.execute(f"""
+                UPDATE cumplidos_nuevos SET (equipo_id, coincidencias) = (
+                    SELECT MIN(e.id), COUNT(*) FROM {EQUIPOS_TABLE} e
+                    WHERE e.codigo = cumplidos_nuevos.codigo COLLATE NOCASE
+                )
+                WHERE equipo_id IS NULL""")
+            desconocidos = [r[0] for r in cur.execute(
+                "SELECT codigo FROM cumplidos_nuevos WHERE coincidencias = 0 ORDER BY codigo"
+            )]
+            ambiguos = [r[0] for r in cur.execute(
+                "SELECT codigo FROM cumplidos_nuevos WHERE coincidencias > 1 ORDER BY codigo"
+            )]
+            sin_pendientes = [r[0] for r in cur.execute(f"""
+                SELECT c.codigo FROM cumplidos_nuevos c
+                WHERE c.coincidencias = 1
+                  AND NOT EXISTS (SELECT 1 FROM {TAREAS_TABLE} t WHERE t.equipo_id = c.equipo_id AND t.cumplido = 0)
+                ORDER BY c.codigo
+            """)]
+            cur.execute(f"""
+                UPDATE {TAREAS_TABLE} SET cumplido = 1, fecha_cumplimiento = c.fecha
+                FROM (
+                    SELECT MAX(n.fecha) AS fecha, (
+                        SELECT t.id FROM {TAREAS_TABLE} t
+                        WHERE t.equipo_id = n.equipo_id AND t.cumplido = 0
+                        ORDER BY t.fecha_tentativa, t.id LIMIT 1
+                    ) AS tarea
+                    FROM cumplidos_nuevos n
+                    WHERE n.coincidencias = 1
+                    GROUP BY n.equipo_id
+                ) AS c
+                WHERE {TAREAS_TABLE}.id = c.tarea
+            """)
+            marcados = cur.rowcount
+            cur.execute("DELETE FROM cumplidos_nuevos")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return {
+        "marcados": marcados, "desconocidos": desconocidos, "ambiguos": ambiguos, "sin_pendientes": sin_pendientes,
+    }
+
+
+# ---------------- Historial y ciclos siguientes ----------------
+def historial_equipo(db_path, codigo) -> list:
+    """Eventos del equipo [(fecha, tipo, tarea_id, registrado_en)], del más reciente al más antiguo."""
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    return conn.execute(f"""
+        SELECT v.fecha, v.tipo, v.tarea_id, v.registrado_en
+        FROM {EVENTOS_TABLE} v JOIN {EQUIPOS_TABLE} e ON e.id = v.equipo_id
+        WHERE e.codigo = ?
+        ORDER BY v.fecha DESC, v.id DESC""", (str(codigo).strip(),)).fetchall()
+
+
+def programar_siguientes(db_path, hasta=None) -> int:
+    """
+    Agrega la tarea del próximo ciclo a cada equipo vigente con frecuencia y sin tareas pendientes, con fecha tentativa =
+    próximo mantenimiento (último + frecuencia, ya mantenido por el historial). hasta: solo los que vencen
+    hasta esa fecha. Un INSERT ... SELECT sobre el maestro; no relee el Excel. Devuelve cuántas tareas creó.
+    """
+    hasta = fecha_a_iso(hasta)
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    with _lock:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute(f"""
+                INSERT INTO {TAREAS_TABLE} (equipo_id, fecha_tentativa, cumplido)
+                SELECT e.id, e.proximo_mantenimiento, 0 FROM {EQUIPOS_TABLE} e
+                WHERE e.retirado = 0 AND e.frecuencia_meses IS NOT NULL AND e.proximo_mantenimiento IS NOT NULL
+                  AND (? IS NULL OR e.proximo_mantenimiento <= ?)
+                  AND NOT EXISTS (SELECT 1 FROM {TAREAS_TABLE} t WHERE t.equipo_id = e.id AND t.cumplido = 0)
+                ON CONFLICT (equipo_id, fecha_tentativa) DO NOTHING""", (hasta, hasta))
+            creadas = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return creadas
+
+
+# ---------------- Reimportación incremental ----------------
+COLS_INVENTARIO = (                                                                                 # Columnas que entran en la huella (hash) de cada equipo
+    "equipo", "marca", "modelo", "ubicacion", "responsable", "frecuencia_meses", "ultimo_mantenimiento",
+)
+SEP_ORIGEN = " › "                                                                                  # "archivo › hoja" en equipos.origen
+
+
+def diferencias_equipos(db_path, filas, alcance=None, excluir=None) -> dict:
+    """
+    Compara el inventario importado con el maestro de equipos, por código, sin escribir nada.
+    filas: tuplas (codigo, *COLS_INVENTARIO, origen, hash), ver importacion.filas_inventario.
+    Solo se comparan huellas; los equipos guardados sin huella (anteriores a v9) se comparan columna a columna.
+    alcance: nombres de archivo; si se indica, solo se dan de baja los equipos importados desde esos archivos
+    (para lotes por sitio). Por defecto, todo equipo activo ausente del inventario se da de baja.
+    excluir: orígenes ("archivo" o "archivo › hoja") que no se pudieron leer; sus equipos nunca se dan de baja.
+    Devuelve {"nuevos": [filas], "modificados": [filas], "retirados": [códigos], "sin_cambios": n}.
+    """
+    entrantes = {}
+    for fila in filas:                                                                              # Código repetido: gana el último
+        entrantes[fila[0]] = fila
+
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    cols = ", ".join(COLS_INVENTARIO)
+    nuevos, modificados, sin_cambios = [], [], 0
+    guardados = {}
+    for codigo, huella, retirado, origen, *valores in conn.execute(
+        f"SELECT codigo, hash, retirado, origen, {cols} FROM {EQUIPOS_TABLE}"
+    ):
+        guardados[codigo] = (huella, retirado, origen, tuple(valores))
+
+    for codigo, fila in entrantes.items():
+        previo = guardados.get(codigo)
+        if previo is None:
+            nuevos.append(fila)
+            continue
+        huella, retirado, _, valores = previo
+        igual = huella == fila[-1] if huella is not None else valores == tuple(fila[1:-2])
+        if igual and not retirado:
+            sin_cambios += 1
+        else:
+            modificados.append(fila)                                                                # Cambió, o vuelve tras una baja
+
+    archivos = None if alcance is None else set(alcance)
+    excluidos = set(excluir or ())
+    retirados = sorted(
+        codigo for codigo, (_, retirado, origen, _) in guardados.items()
+        if not retirado and codigo not in entrantes
+        and (archivos is None or (origen or "").split(SEP_ORIGEN)[0] in archivos)
+        and not (excluidos and ((origen or "") in excluidos or (origen or "").split(SEP_ORIGEN)[0] in excluidos))
+    )
+    return {"nuevos": nuevos, "modificados": modificados, "retirados": retirados, "sin_cambios": sin_cambios}
+
+
+def aplicar_diferencias(db_path, dif) -> None:
+    """Aplica el resultado de diferencias_equipos en una sola transacción: solo se escriben los equipos que cambian."""
+    cols = ("codigo",) + COLS_INVENTARIO + ("origen", "hash")
+    marcas = ", ".join("?" * len(cols))
+    asignaciones = ", ".join(                                                                       # El último mantenimiento nunca retrocede
+        "ultimo_mantenimiento = CASE WHEN ?1 > COALESCE(ultimo_mantenimiento, '') "
+        "THEN ?1 ELSE ultimo_mantenimiento END".replace("?1", f"?{i}")
+        if c == "ultimo_mantenimiento" else f"{c} = ?{i}"
+        for i, c in enumerate(cols[1:], start=1)
+    )
+
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    with _lock:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.executemany(
+                f"INSERT INTO {EQUIPOS_TABLE} ({', '.join(cols)}) VALUES ({marcas})", dif["nuevos"]
+            )
+            cur.executemany(
+                f"UPDATE {EQUIPOS_TABLE} SET {asignaciones}, retirado = 0 WHERE codigo = ?{len(cols)}",
+                [fila[1:] + fila[:1] for fila in dif["modificados"]],
+            )
+            cur.execute(
+                f"UPDATE {EQUIPOS_TABLE} SET retirado = 1 WHERE codigo IN (SELECT value FROM json_each(?))",
+                (json.dumps(dif["retirados"]),),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
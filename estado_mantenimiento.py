@@ -0,0 +1,69 @@
+# Motor de estado de mantenimiento (Pendiente / Próximo / Al día).
+# No depende de tkinter: lo usan la ventana del plan y cualquier proceso por lotes.
+
+import numpy as np
+import pandas as pd
+
+
+ESTADO_PENDIENTE = "Pendiente"
+ESTADO_PROXIMO = "Próximo"
+ESTADO_AL_DIA = "Al día"
+
+# Horizontes para "Próximo": (días hasta el próximo mantenimiento, etiqueta), de menor a mayor.
+# Ej.: ((30, "Este mes"), (180, "Próximo")) distingue dos niveles de urgencia.
+HORIZONTES_PROXIMO = ((180, ESTADO_PROXIMO),)
+
+
+def proximo_mantenimiento(ultimo, frecuencia) -> pd.Series:
+    """
+    Fecha del próximo mantenimiento = último mantenimiento + frecuencia (meses), para toda la columna.
+    Igual que pd.DateOffset(months=n): si el día no existe en el mes destino, se usa el último día del mes.
+    Devuelve NaT donde falta la fecha o la frecuencia.
+    """
+    ultimo = pd.to_datetime(pd.Series(ultimo), errors="coerce")
+    meses = pd.to_numeric(pd.Series(frecuencia), errors="coerce").to_numpy(dtype="float64")  # Por posición
+
+    fechas = ultimo.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    validos = ~np.isnat(fechas) & np.isfinite(meses)
+
+    mes = fechas.astype("datetime64[M]")
+    dia = (fechas - mes.astype("datetime64[D]")).astype(np.int64)                       # 0 = día 1 del mes
+    destino = mes + np.where(validos, meses, 0).astype(np.int64).astype("timedelta64[M]")
+    dias_destino = (
+        (destino + np.timedelta64(1, "M")).astype("datetime64[D]") - destino.astype("datetime64[D]")
+    ).astype(np.int64)
+    resultado = destino.astype("datetime64[D]") + np.minimum(dia, dias_destino - 1).astype("timedelta64[D]")
+    resultado[~validos] = np.datetime64("NaT")
+
+    return pd.Series(resultado.astype("datetime64[ns]"), index=ultimo.index)
+
+
+def clasificar(proximo, hoy=None, horizontes=HORIZONTES_PROXIMO) -> pd.Series:
+    """
+    Estado a partir de la fecha del próximo mantenimiento, con un único "hoy" para toda la corrida.
+    Sin fecha o vencido -> Pendiente; dentro de algún horizonte -> su etiqueta; si no -> Al día.
+    """
+    proximo = pd.to_datetime(pd.Series(proximo), errors="coerce")
+    hoy = pd.Timestamp.today().normalize() if hoy is None else pd.Timestamp(hoy).normalize()
+
+    dias = (proximo - hoy).dt.days.to_numpy(dtype="float64")                            # NaT -> NaN
+    condiciones = [np.isnan(dias) | (dias < 0)]
+    etiquetas = [ESTADO_PENDIENTE]
+    for limite, etiqueta in sorted(horizontes):
+        condiciones.append(dias <= limite)
+        etiquetas.append(etiqueta)
+
+    estados = np.select(condiciones, etiquetas, default=ESTADO_AL_DIA)
+    return pd.Series(estados, index=proximo.index, dtype="object")
+
+
+def calcular_estado(ultimo, frecuencia, hoy=None, horizontes=HORIZONTES_PROXIMO) -> pd.Series:
+    """Atajo: proximo_mantenimiento + clasificar."""
+    return clasificar(proximo_mantenimiento(ultimo, frecuencia), hoy=hoy, horizontes=horizontes)
+
+
+def agregar_estado(df: pd.DataFrame, hoy=None, horizontes=HORIZONTES_PROXIMO) -> pd.DataFrame:
+    """Agrega a df (base de equipos normalizada) las columnas proximo_mantenimiento y estado."""
+    df["proximo_mantenimiento"] = proximo_mantenimiento(df["ultimo_mantenimiento"], df["frecuencia_meses"])
+    df["estado"] = clasificar(df["proximo_mantenimiento"], hoy=hoy, horizontes=horizontes)
+    return df
@@ -0,0 +1,206 @@
+# Generación del informe LaTeX del plan a partir de la BD y una plantilla. No depende de tkinter:
+# lo usan la ventana InformeLatexApp y la línea de comandos (cli.py).
+
+from pathlib import Path
+import pandas as pd
+import re
+from datetime import date
+from database import ensure_table, get_connection, iso_a_ui, PLAN_TABLE
+
+
+PLACEHOLDER = "% TABLAS_PLAN_MANTENIMIENTO"
+
+
+def fecha_actual_espanol() -> str:
+    """
+    Devuelve la fecha actual en español, por ejemplo:
+    'Jueves, 27 de noviembre del 2025'
+    """
+    dias = [
+        "Lunes", "Martes", "Miércoles", "Jueves",
+        "Viernes", "Sábado", "Domingo"
+    ]
+    meses = [
+        "enero", "febrero", "marzo", "abril", "mayo", "junio",
+        "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+    ]
+    hoy = date.today()
+    nombre_dia = dias[hoy.weekday()]      # lunes = 0
+    nombre_mes = meses[hoy.month - 1]     # enero = 0
+    return f"{nombre_dia}, {hoy.day} de {nombre_mes} del {hoy.year}"
+
+
+def latex_escape(text: str) -> str:
+    """
+    Escapa caracteres especiales de LaTeX en un texto.
+    """
+    replacements = {
+        "&": r"\&",
+        "%": r"\%",
+        "#": r"\#",
+        "_": r"\_",
+        "{": r"\{",
+        "}": r"\}",
+        "$": r"\$",
+        "~": r"\textasciitilde{}",
+        "^": r"\textasciicircum{}",
+        "\\": r"\textbackslash{}",
+    }
+    return "".join(replacements.get(c, c) for c in text)
+
+
+def latex_label_from_ubicacion(ubicacion: str) -> str:
+    """
+    Genera una etiqueta LaTeX segura (para \\label) a partir de la ubicación.
+    """
+    base = ubicacion.lower()
+    base = re.sub(r"[^a-z0-9]+", "_", base)
+    base = re.sub(r"_+", "_", base).strip("_")
+    if not base:
+        base = "lab"
+    return f"tab:plan_mant_{base}"
+
+
+def generar_tablas_latex(df: pd.DataFrame) -> str:
+    """
+    Genera tablas LaTeX por ubicación.
+
+    Agrupa por (equipo, responsable), de modo que si un mismo equipo
+    tiene responsables distintos, se separan en filas distintas con su propia cantidad.
+    """
+    lineas = []
+
+    df = df.copy()
+    # Aseguramos tipo string para las fechas (ISO yyyy-mm-dd: el orden de texto es cronológico)
+    df["fecha_tentativa"] = df["fecha_tentativa"].fillna("").astype(str)
+
+    # Asegurar columna 'responsable'; si no existe, usar valor por defecto
+    if "responsable" not in df.columns:
+        df["responsable"] = "Téc. de Laboratorio"
+    else:
+        df["responsable"] = df["responsable"].fillna("Téc. de Laboratorio")
+
+    # Recorremos por ubicación
+    for ubicacion, df_ubic in df.groupby("ubicacion"):
+        ubic_esc = latex_escape(str(ubicacion))
+        label = latex_label_from_ubicacion(str(ubicacion))
+
+        lineas.append(r"\begin{table}[htbp]")
+        lineas.append(r"    \centering")
+        lineas.append(
+            f"    \\caption{{Plan de mantenimiento preventivo de equipos / {ubic_esc}}}"
+        )
+        lineas.append(f"    \\label{{{label}}}")
+        lineas.append(r"    {\footnotesize")
+        lineas.append(r"    \begin{tabular}{p{3.9cm}p{1.3cm}p{3.0cm}p{4.0cm}p{1.5cm}}")
+        lineas.append(r"        \toprule")
+        lineas.append(
+            r"        \textbf{Equipo} & \textbf{Cantidad} & \textbf{Ubicación} & "
+            r"\textbf{Responsable} & \textbf{Fecha} \\"
+        )
+        lineas.append(r"        \midrule")
+
+        # Agrupamos por (equipo, responsable) para contar cuántos equipos hay por responsable
+        counts = (
+            df_ubic.groupby(["equipo", "responsable"])
+            .size()
+            .to_dict()
+        )
+
+        # Fechas únicas por (equipo, responsable)
+        fechas_por_grupo = (
+            df_ubic.groupby(["equipo", "responsable"])["fecha_tentativa"]
+            .apply(lambda s: sorted({f for f in s if isinstance(f, str) and f.strip()}))
+            .to_dict()
+        )
+
+        # Ordenamos por equipo y responsable para que la salida sea consistente
+        for (equipo, responsable) in sorted(
+            fechas_por_grupo.keys(),
+            key=lambda x: (str(x[0]), str(x[1])),
+        ):
+            equipo_esc = latex_escape(str(equipo))
+            resp_esc = latex_escape(str(responsable))
+            cantidad = counts.get((equipo, responsable), 0)
+
+            fechas = fechas_por_grupo[(equipo, responsable)]
+            if not fechas:
+                fechas = [""]
+
+            n_fechas = len(fechas)
+
+            equipo_cell = rf"\multirow{{{n_fechas}}}{{*}}{{{equipo_esc}}}"
+            cantidad_cell = rf"\multirow{{{n_fechas}}}{{*}}{{{cantidad}}}"
+            ubic_cell = rf"\multirow{{{n_fechas}}}{{*}}{{{ubic_esc}}}"
+            resp_cell = rf"\multirow{{{n_fechas}}}{{*}}{{{resp_esc}}}"
+
+            for i, fecha in enumerate(fechas):
+                fecha_esc = latex_escape(iso_a_ui(fecha))
+                if i == 0:
+                    lineas.append(
+                        f"        {equipo_cell} & {cantidad_cell} & {ubic_cell} "
+                        f"& {resp_cell} & {fecha_esc} \\\\"
+                    )
+                else:
+                    lineas.append(
+                        f"        & & & & {fecha_esc} \\\\"
+                    )
+
+        lineas.append(r"        \bottomrule")
+        lineas.append(r"    \end{tabular}")
+        lineas.append(r"    }")
+        lineas.append(r"\end{table}")
+        lineas.append("")
+
+    return "\n".join(lineas)
+
+
+def generar_informe_desde_archivos(
+    db_path: Path,
+    template_path: Path,
+    output_path: Path,
+    periodo_academico: str,
+    fecha_presentacion: str,
+) -> None:
+    """
+    Lógica de generación del informe: lee la BD, arma las tablas y escribe el .tex final.
+    También reemplaza el período académico y la fecha de presentación en la plantilla.
+    """
+    if not db_path.exists():
+        raise FileNotFoundError(f"No se encontró la base de datos: {db_path}")
+
+    if not template_path.exists():
+        raise FileNotFoundError(f"No se encontró la plantilla LaTeX: {template_path}")
+
+    ensure_table(db_path)
+    con = get_connection(db_path)
+    df = pd.read_sql_query(
+        "SELECT equipo, ubicacion, fecha_tentativa, responsable "
+        f"FROM {PLAN_TABLE}",
+        con,
+    )
+
+    if df.empty:
+        raise ValueError("La tabla plan_mantenimiento está vacía.")
+
+    tablas_latex = generar_tablas_latex(df)
+
+    template_text = template_path.read_text(encoding="utf-8")
+
+    # Reemplazar período académico y fecha de presentación
+    template_text = template_text.replace(
+        "<<PERIODO_ACADEMICO>>",
+        latex_escape(periodo_academico),
+    )
+    template_text = template_text.replace(
+        "<<FECHA_PRESENTACION>>",
+        latex_escape(fecha_presentacion),
+    )
+
+    if PLACEHOLDER not in template_text:
+        raise RuntimeError(
+            f"No se encontró el marcador '{PLACEHOLDER}' en la plantilla LaTeX."
+        )
+
+    salida = template_text.replace(PLACEHOLDER, tablas_latex)
+    output_path.write_text(salida, encoding="utf-8")
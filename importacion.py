@@ -0,0 +1,356 @@
+# Importación de la base de equipos desde Excel (.xlsx) o CSV, por bloques.
+# Solo se leen las columnas requeridas y cada bloque se normaliza antes de leer el siguiente,
+# así la memoria intermedia no crece con el tamaño del archivo. No depende de tkinter.
+# importar_lote lee varios libros (y todas sus hojas) en paralelo, una hoja por proceso.
+
+import csv
+import os
+import re
+import time
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+
+EXCEL_COLUMN_MAP = {
+    "Equipo": "equipo",
+    "Marca": "marca",
+    "Modelo": "modelo",
+    "Codigo": "codigo",
+    "Código": "codigo",
+    "Ubicacion": "ubicacion",
+    "Ubicación": "ubicacion",
+    "Responsable": "responsable",
+    "Frecuencia (meses)": "frecuencia_meses",
+    "Fecha último mantenimiento": "ultimo_mantenimiento",  # texto dd/mm/yyyy o celda de fecha
+}
+
+COLUMNAS_REQUERIDAS = [
+    "equipo",
+    "marca",
+    "modelo",
+    "codigo",
+    "ubicacion",
+    "responsable",
+    "frecuencia_meses",
+    "ultimo_mantenimiento",
+]
+COLUMNAS_TEXTO = COLUMNAS_REQUERIDAS[:6]
+
+CHUNK_FILAS = 20000
+EXTENSIONES_CSV = (".csv", ".txt")
+EXTENSIONES_EXCEL = (".xlsx", ".xlsm")
+
+
+def _mapear_cabeceras(cabeceras) -> dict:
+    """Devuelve {columna interna: posición en el archivo}. Lanza ValueError si falta alguna requerida."""
+    posiciones = {}
+    for i, cab in enumerate(cabeceras):
+        interna = EXCEL_COLUMN_MAP.get(str(cab).strip()) if cab is not None else None
+        if interna and interna not in posiciones:                                   # "Codigo" y "Código": gana la primera
+            posiciones[interna] = i
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in posiciones]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el Excel: {', '.join(faltantes)}")
+    return posiciones
+
+
+def _bloques_xlsx(path, chunk, hoja=None):
+    import openpyxl  # Solo hace falta para .xlsx
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)              # Lector en streaming
+    try:
+        ws = wb.active if hoja is None else wb[hoja]
+        filas = ws.iter_rows(values_only=True)
+        posiciones = _mapear_cabeceras(next(filas, ()))
+        indices = [posiciones[c] for c in COLUMNAS_REQUERIDAS]
+        ancho = max(indices) + 1
+
+        bloque = []
+        for fila in filas:
+            if fila is None or not any(v is not None for v in fila):               # Filas vacías al final de la hoja
+                continue
+            if len(fila) < ancho:
+                fila = tuple(fila) + (None,) * (ancho - len(fila))
+            bloque.append([fila[i] for i in indices])
+            if len(bloque) >= chunk:
+                yield pd.DataFrame(bloque, columns=COLUMNAS_REQUERIDAS)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=COLUMNAS_REQUERIDAS)
+    finally:
+        wb.close()
+
+
+def _bloques_csv(path, chunk, encoding="utf-8-sig"):
+    with open(path, "r", encoding=encoding, newline="") as f:
+        primera = f.readline()
+    sep = ";" if primera.count(";") > primera.count(",") else ","                   # Excel en español exporta con ';'
+    posiciones = _mapear_cabeceras(next(csv.reader([primera], delimiter=sep), []))
+    nombres = {pos: interna for interna, pos in posiciones.items()}
+
+    lector = pd.read_csv(
+        path,
+        sep=sep,
+        encoding=encoding,
+        usecols=list(nombres),
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk,
+    )
+    for bloque in lector:
+        bloque.columns = [nombres[pos] for pos in sorted(nombres)]                 # usecols conserva el orden del archivo
+        yield bloque[COLUMNAS_REQUERIDAS]
+
+
+def _parsear_fechas(col: pd.Series) -> pd.Series:
+    """dd/mm/yyyy (texto) o fechas ya tipadas por Excel -> datetime64; vacíos/inválidos -> NaT."""
+    texto = col.astype("string").str.strip()
+    fechas = pd.to_datetime(texto, format="%d/%m/%Y", errors="coerce")
+    resto = fechas.isna() & texto.notna() & (texto != "")
+    if resto.any():
+        fechas[resto] = pd.to_datetime(texto[resto], format="ISO8601", errors="coerce")
+    return fechas
+
+
+def normalizar_bloque(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipos internos: texto para los datos del equipo, número para la frecuencia, fecha para el último mantenimiento."""
+    for col in COLUMNAS_TEXTO:
+        df[col] = df[col].fillna("").astype(str).str.strip()
+    df["frecuencia_meses"] = pd.to_numeric(df["frecuencia_meses"], errors="coerce")
+    df["ultimo_mantenimiento"] = _parsear_fechas(df["ultimo_mantenimiento"])
+    return df
+
+
+def nombre_origen(path, hoja=None) -> str:
+    """Valor de la columna origen: nombre del archivo y, si se indicó, la hoja."""
+    nombre = Path(path).name
+    return f"{nombre} › {hoja}" if hoja else nombre
+
+
+def iter_equipos(path, chunk: int = CHUNK_FILAS, progreso=None, hoja=None):
+    """
+    Genera bloques ya normalizados de la base de equipos (.xlsx o .csv), con la columna origen.
+    hoja: nombre de la hoja del libro; por defecto, la activa.
+    progreso(filas_leidas, filas_por_segundo) se llama después de cada bloque.
+    """
+    path = Path(path)
+    if path.suffix.lower() in EXTENSIONES_CSV:
+        bloques = _bloques_csv(path, chunk)
+    else:
+        bloques = _bloques_xlsx(path, chunk, hoja)
+
+    origen = nombre_origen(path, hoja)
+    inicio = time.perf_counter()
+    filas = 0
+    for bloque in bloques:
+        bloque = normalizar_bloque(bloque)
+        bloque["origen"] = origen
+        filas += len(bloque)
+        if progreso is not None:
+            progreso(filas, filas / max(time.perf_counter() - inicio, 1e-9))
+        yield bloque
+
+
+def importar_equipos(path, chunk: int = CHUNK_FILAS, progreso=None, cancelar=None, hoja=None):
+    """
+    Lee y normaliza todo el archivo por bloques y devuelve un único DataFrame.
+    cancelar: threading.Event opcional; si se activa, se deja de leer y se devuelve None.
+    """
+    bloques = []
+    for bloque in iter_equipos(path, chunk=chunk, progreso=progreso, hoja=hoja):
+        if cancelar is not None and cancelar.is_set():
+            return None
+        bloques.append(bloque)
+    if not bloques:
+        return _vacio()
+    return pd.concat(bloques, ignore_index=True)
+
+
+def _vacio() -> pd.DataFrame:
+    vacio = normalizar_bloque(pd.DataFrame(columns=COLUMNAS_REQUERIDAS))
+    vacio["origen"] = pd.Series(dtype=object)
+    return vacio
+
+
+# ---------------- Importación por lotes (varios libros y hojas) ----------------
+def expandir_rutas(rutas) -> list:
+    """Archivos .xlsx/.csv de la lista; las carpetas se recorren (sin subcarpetas), en orden alfabético."""
+    archivos = []
+    for ruta in rutas:
+        ruta = Path(ruta)
+        candidatos = sorted(ruta.iterdir()) if ruta.is_dir() else [ruta]
+        for p in candidatos:
+            if p.name.startswith("~$"):                                             # Archivos de bloqueo de Excel
+                continue
+            if p.suffix.lower() in EXTENSIONES_EXCEL + EXTENSIONES_CSV or not ruta.is_dir():
+                archivos.append(p)
+    return archivos
+
+
+def hojas(path) -> list:
+    """Hojas del libro (None para un CSV). En modo solo lectura no se cargan las celdas."""
+    if Path(path).suffix.lower() in EXTENSIONES_CSV:
+        return [None]
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def _importar_hoja(path, hoja, chunk):
+    """Trabajo de cada proceso: devuelve (DataFrame, None) o (None, mensaje de error)."""
+    try:
+        return importar_equipos(path, chunk=chunk, hoja=hoja), None
+    except ValueError as e:                                                         # Hoja sin las columnas requeridas
+        return None, str(e)
+    except Exception as e:
+        return None, f"No se pudo leer: {e}"
+
+
+def importar_lote(rutas, procesos=None, chunk: int = CHUNK_FILAS, progreso=None, cancelar=None):
+    """
+    Importa varios libros/CSV (o carpetas con ellos), cada hoja en un proceso aparte, y une todo en un
+    DataFrame con la columna origen ("archivo › hoja"). Las hojas que no tienen las columnas requeridas
+    no detienen el lote: se informan en errores.
+    progreso(hojas_terminadas, hojas_totales, filas) se llama al terminar cada hoja.
+    Devuelve (DataFrame, errores [(origen, mensaje)]), o None si se canceló.
+    """
+    tareas, errores = [], []
+    for path in expandir_rutas(rutas):
+        try:
+            nombres = hojas(path)
+        except Exception as e:
+            errores.append((nombre_origen(path), f"No se pudo abrir: {e}"))
+            continue
+        tareas.extend((path, hoja if len(nombres) > 1 else None) for hoja in nombres)
+    if not tareas:
+        return _vacio(), errores
+
+    resultados = [None] * len(tareas)
+    filas = 0
+    procesos = min(procesos or os.cpu_count() or 1, len(tareas))
+    with ProcessPoolExecutor(max_workers=procesos) as ex:
+        futuros = {ex.submit(_importar_hoja, p, h, chunk): i for i, (p, h) in enumerate(tareas)}
+        for hechas, futuro in enumerate(as_completed(futuros), start=1):
+            if cancelar is not None and cancelar.is_set():
+                ex.shutdown(wait=False, cancel_futures=True)
+                return None
+            i = futuros[futuro]
+            df, error = futuro.result()
+            if error:
+                errores.append((nombre_origen(*tareas[i]), error))
+            else:
+                resultados[i] = df
+                filas += len(df)
+            if progreso is not None:
+                progreso(hechas, len(tareas), filas)
+
+    bloques = [df for df in resultados if df is not None and not df.empty]          # En el orden de las rutas
+    if not bloques:
+        return _vacio(), errores
+    return pd.concat(bloques, ignore_index=True), errores
+
+
+# ---------------- Huella de cada equipo (reimportación incremental) ----------------
+COLUMNAS_HUELLA = ["equipo", "marca", "modelo", "ubicacion", "responsable", "frecuencia_meses", "ultimo_mantenimiento"]
+
+
+def filas_inventario(df: pd.DataFrame) -> list:
+    """
+    Tuplas (codigo, *COLUMNAS_HUELLA, origen, hash) listas para database.diferencias_equipos.
+    El hash se calcula sobre el texto canónico de cada fila (fecha ISO, frecuencia sin decimales sobrantes),
+    así no cambia por diferencias de tipo entre un Excel y un CSV. Las filas sin código se descartan.
+    """
+    df = df[df["codigo"] != ""]
+    frecuencia = [                                                                  # Lista: una Series volvería a float con NaN
+        None if pd.isna(v) else (int(v) if float(v).is_integer() else float(v))
+        for v in df["frecuencia_meses"].tolist()
+    ]
+    ultimo = df["ultimo_mantenimiento"].dt.strftime("%Y-%m-%d")
+
+    canonico = df[COLUMNAS_HUELLA[:5]].copy()
+    canonico["frecuencia_meses"] = ["" if v is None else str(v) for v in frecuencia]
+    canonico["ultimo_mantenimiento"] = ultimo.fillna("")
+    huellas = pd.util.hash_pandas_object(canonico, index=False).to_numpy().view("int64")   # SQLite: entero con signo
+
+    origen = df["origen"] if "origen" in df.columns else pd.Series("", index=df.index)
+    columnas = [df[c].tolist() for c in ["codigo"] + COLUMNAS_HUELLA[:5]] + [
+        frecuencia, [None if pd.isna(v) else v for v in ultimo.tolist()], origen.tolist(),
+    ]
+    return [fila + (int(h),) for fila, h in zip(zip(*columnas), huellas)]
+
+
+# ---------------- Cumplimientos (código, fecha) ----------------
+CABECERAS_CUMPLIMIENTO = {
+    "Codigo": "codigo",
+    "Código": "codigo",
+    "codigo": "codigo",
+    "Fecha": "fecha",
+    "Fecha cumplimiento": "fecha",
+    "fecha": "fecha",
+    "fecha_cumplimiento": "fecha",
+}
+
+
+_FECHA_LOG = re.compile(r"\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2}")
+_HORA_LOG = re.compile(r"\d{1,2}:\d{2}(:\d{2})?([.,]\d+)?")
+
+
+def _par_de_log(linea) -> tuple:
+    """
+    (código, fecha) de una línea de registro de lector de códigos de barras: campos separados por coma,
+    punto y coma o tabulador (o por espacios si no hay otro separador), en cualquier orden. El primer campo
+    que empieza con una fecha es la fecha (se ignora la hora); el primero que no es fecha ni hora, el código.
+    """
+    campos = re.split(r"[,;\t]", linea)
+    if len(campos) == 1:
+        campos = linea.split()
+    codigo = fecha = ""
+    for campo in campos:
+        campo = campo.strip()
+        inicio = re.split(r"[ T]", campo, maxsplit=1)[0]
+        if _FECHA_LOG.fullmatch(inicio):
+            fecha = fecha or inicio
+        elif campo and not codigo and not _HORA_LOG.fullmatch(campo):
+            codigo = campo
+    return codigo, fecha
+
+
+def iter_cumplimientos(path, encoding="utf-8-sig"):
+    """
+    Genera (código, fecha) desde un CSV con columna Código y, opcional, Fecha (dd/mm/yyyy o ISO; vacía = hoy),
+    o desde un registro de lector sin cabecera (una lectura por línea, ver _par_de_log; "#" = comentario).
+    Se lee línea por línea. Lanza ValueError si hay cabecera pero no columna de código.
+    """
+    with open(path, "r", encoding=encoding, newline="") as f:
+        primera = f.readline()
+        sep = ";" if primera.count(";") > primera.count(",") else ","
+        posiciones = {}
+        for i, cab in enumerate(next(csv.reader([primera], delimiter=sep), [])):
+            interna = CABECERAS_CUMPLIMIENTO.get(cab.strip())
+            if interna and interna not in posiciones:
+                posiciones[interna] = i
+
+        if not posiciones:
+            # Registro de lector: la primera línea ya es una lectura
+            for linea in chain([primera], f):
+                linea = linea.strip()
+                if linea and not linea.startswith("#"):
+                    yield _par_de_log(linea)
+            return
+
+        if "codigo" not in posiciones:
+            raise ValueError(f"Falta la columna Código en {Path(path).name}")
+        i_cod, i_fecha = posiciones["codigo"], posiciones.get("fecha")
+
+        for fila in csv.reader(f, delimiter=sep):
+            if len(fila) <= i_cod:
+                continue
+            fecha = fila[i_fecha].strip() if i_fecha is not None and i_fecha < len(fila) else ""
+            yield fila[i_cod].strip(), fecha
@@ -6,6 +6,7 @@ from plan_mantenimiento import PlanMantenimientoApp
 from cumplimiento import CumplimientoApp
 from resumen_insights import ResumenInsightsApp
 from informe_latex import InformeLatexApp
+from database import close_all
 
 
 # ====== FUNCIÓN PARA CENTRAR CUALQUIER VENTANA ======
@@ -113,6 +114,7 @@ class MenuApp:
     # ====== FUNCIÓN DE CIERRE GLOBAL ======
     def cerrar_app(self):
         """Cierra TODA la aplicación de forma limpia."""
+        close_all()  # PRAGMA optimize + cierre de las conexiones compartidas
         self.root.destroy()
 
     # ====== FUNCIONES ======
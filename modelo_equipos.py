@@ -0,0 +1,154 @@
+# Estructuras en memoria sobre el DataFrame de equipos importado. No depende de tkinter.
+
+from itertools import repeat
+
+import pandas as pd
+
+
+class IndiceUbicaciones:
+    """
+    Partición del DataFrame de equipos por ubicación, construida una vez por carga.
+    Para cada ubicación guarda las etiquetas de fila y los textos de la lista ya armados,
+    así filtrar por ubicación cuesta O(k) en las filas de esa ubicación y no O(n).
+    """
+
+    def __init__(self, df: pd.DataFrame, formato, columna: str = "ubicacion"):
+        self._formato = formato        # función vectorizada: DataFrame -> Series de textos
+        self._columna = columna
+        self.reconstruir(df)
+
+    def reconstruir(self, df: pd.DataFrame) -> None:
+        self.df = df
+        self._filas = {}               # ubicación -> [etiqueta de fila]
+        self._textos = {}              # ubicación -> [texto], mismo orden que _filas
+        self._ubic_de = {}             # etiqueta de fila -> ubicación
+        self._texto_de = {}            # etiqueta de fila -> texto
+        self._indexar(df)
+
+    def _indexar(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        textos = self._formato(df)
+        claves = df[self._columna].astype(str)
+        for ubic, pos in df.groupby(claves, sort=False).indices.items():
+            etiquetas = df.index[pos].tolist()
+            textos_ubic = textos.iloc[pos].tolist()
+            self._filas.setdefault(ubic, []).extend(etiquetas)
+            self._textos.setdefault(ubic, []).extend(textos_ubic)
+            self._ubic_de.update(zip(etiquetas, repeat(ubic)))
+            self._texto_de.update(zip(etiquetas, textos_ubic))
+
+    def _desindexar(self, etiquetas) -> None:
+        for etiqueta in etiquetas:
+            ubic = self._ubic_de.pop(etiqueta, None)
+            if ubic is None:
+                continue
+            del self._texto_de[etiqueta]
+            i = self._filas[ubic].index(etiqueta)
+            del self._filas[ubic][i]
+            del self._textos[ubic][i]
+            if not self._filas[ubic]:
+                del self._filas[ubic], self._textos[ubic]
+
+    # ---------- Consultas ----------
+    def ubicaciones(self) -> list:
+        return sorted(self._filas)
+
+    def filas(self, ubicacion) -> list:
+        """Etiquetas de fila (índice de df) de la ubicación, en orden de lista."""
+        return self._filas.get(str(ubicacion), [])
+
+    def textos(self, ubicacion) -> list:
+        """Textos para mostrar, en el mismo orden que filas()."""
+        return self._textos.get(str(ubicacion), [])
+
+    def subconjunto(self, ubicacion) -> pd.DataFrame:
+        return self.df.loc[self.filas(ubicacion)]
+
+    def ubicacion_de(self, etiqueta):
+        return self._ubic_de.get(etiqueta)
+
+    def texto(self, etiqueta) -> str:
+        return self._texto_de[etiqueta]
+
+    # ---------- Cambios incrementales ----------
+    def agregar(self, df_nuevas: pd.DataFrame) -> None:
+        """Agrega filas nuevas (con etiquetas que no existan en df)."""
+        self.df = pd.concat([self.df, df_nuevas])
+        self._indexar(df_nuevas)
+
+    def actualizar(self, etiquetas) -> None:
+        """Vuelve a indexar filas ya modificadas en df (texto y, si cambió, ubicación)."""
+        etiquetas = list(etiquetas)
+        self._desindexar(etiquetas)
+        self._indexar(self.df.loc[etiquetas])
+
+    def quitar(self, etiquetas) -> None:
+        etiquetas = list(etiquetas)
+        self._desindexar(etiquetas)
+        self.df = self.df.drop(index=etiquetas)
+
+
+class SeleccionEquipos:
+    """
+    Equipos elegidos para el plan, con clave = código del equipo (la misma clave que la tabla equipos).
+    Guarda una copia de cada fila y su texto, así no depende de la carga de Excel actual.
+    Pertenencia, alta y baja cuestan O(1) por equipo; claves() mantiene el orden de agregado.
+    """
+
+    def __init__(self):
+        self._filas = {}               # código -> dict con los datos de la fila
+        self._textos = {}              # código -> texto para mostrar
+        self._orden = []               # códigos en orden de agregado (se modifica en el lugar)
+
+    def __len__(self):
+        return len(self._orden)
+
+    def __contains__(self, codigo):
+        return codigo in self._filas
+
+    def __iter__(self):
+        return iter(self._orden)
+
+    def claves(self) -> list:
+        """Lista (viva) de códigos en orden; sirve como fuente de datos de ListaVirtual."""
+        return self._orden
+
+    def fila(self, codigo) -> dict:
+        return self._filas[codigo]
+
+    def texto(self, codigo) -> str:
+        return self._textos[codigo]
+
+    def agregar(self, df: pd.DataFrame, textos) -> tuple:
+        """
+        Agrega las filas de df (textos: alineados con df). Los códigos repetidos se ignoran.
+        Devuelve (agregados, sin_código).
+        """
+        agregados = sin_codigo = 0
+        for fila, texto in zip(df.to_dict("records"), textos):
+            codigo = str(fila.get("codigo", "")).strip()
+            if not codigo:
+                sin_codigo += 1
+                continue
+            if codigo in self._filas:
+                continue
+            self._filas[codigo] = fila
+            self._textos[codigo] = texto
+            self._orden.append(codigo)
+            agregados += 1
+        return agregados, sin_codigo
+
+    def quitar(self, codigos) -> int:
+        quitar = set(codigos) & self._filas.keys()
+        if not quitar:
+            return 0
+        for codigo in quitar:
+            del self._filas[codigo], self._textos[codigo]
+        self._orden[:] = [c for c in self._orden if c not in quitar]    # Una pasada por lote, no por equipo
+        return len(quitar)
+
+    def limpiar(self) -> None:
+        self._filas.clear()
+        self._textos.clear()
+        self._orden.clear()
@@ -1,23 +1,29 @@
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
 import datetime as dt
-import sqlite3
-from database import ensure_table, PLAN_TABLE  # ensure_table(path), PLAN_TABLE nombre de la tabla
+import threading
+import queue
+import os
+from database import (  # ensure_table(path)
+    ensure_table, guardar_plan, fecha_a_iso, sql_fecha_ui, valores_distintos, filtros_plan,
+    ConsultaPaginada, eliminar_plan, deshacer_eliminacion, guardar_equipos, diferencias_equipos,
+    aplicar_diferencias, buscar_equipos,
+)
 from utils import load_config, save_config
+from estado_mantenimiento import agregar_estado
+from importacion import importar_equipos, importar_lote, filas_inventario
+import cache_equipos
+from modelo_equipos import IndiceUbicaciones, SeleccionEquipos
+from widgets import ListaVirtual, GrillaEditable, TablaPaginada, CampoBusqueda
 
 
-EXCEL_COLUMN_MAP = {
-    "Equipo": "equipo",
-    "Marca": "marca",
-    "Modelo": "modelo",
-    "Codigo": "codigo",
-    "Código": "codigo",
-    "Ubicacion": "ubicacion",
-    "Ubicación": "ubicacion",
-    "Frecuencia (meses)": "frecuencia",
-    "Fecha último mantenimiento": "fecha"
-}
+def textos_disp(df):
+    """Texto de cada fila para las listas, armado sobre columnas completas (sin iterrows)."""
+    cols = ["equipo", "marca", "modelo", "codigo", "ubicacion", "ultimo_mantenimiento_str", "estado"]
+    texto = df[cols[0]].astype(str)
+    for c in cols[1:]:
+        texto = texto + " | " + df[c].astype(str)
+    return texto
 
 
 class PlanMantenimientoApp:
@@ -90,9 +96,15 @@ class PlanMantenimientoApp:
         # ===============================================================
 
         self.df = None
-        self.df_filtrada = None
-        self.equipos_seleccionados = []
-        self.item_rows = {}
+        self.indice = None          # IndiceUbicaciones: filas y textos por ubicación
+        self.filas_filtradas = None # etiquetas de self.df mostradas en lista_equipos
+        self.seleccion = SeleccionEquipos()  # equipos elegidos, por código
+
+        # Carga de Excel en segundo plano
+        self._carga = None          # threading.Thread en curso
+        self._cancelar = None       # threading.Event para cancelar
+        self._cola = None           # queue.Queue hilo -> Tk
+        self._after_carga = None    # id del after() que revisa la cola
 
         cfg = load_config()
         self.plan_db = cfg.get("plan_db", "mantenimiento.db")
@@ -162,12 +174,44 @@ class PlanMantenimientoApp:
         btn_excel_frame = ttk.Frame(self.root)
         btn_excel_frame.pack(fill="x", padx=10)
 
-        ttk.Button(
+        self.btn_excel = ttk.Button(
             btn_excel_frame,
             text="Cargar Base de Datos (Excel)",
             command=self.cargar_excel,
             style="GreenButton.TButton",
-        ).pack(pady=5, fill="x")
+        )
+        self.btn_excel.pack(pady=5, fill="x")
+
+        # Varios libros (todas sus hojas) en paralelo, uno por proceso
+        self.btn_lote = ttk.Button(
+            btn_excel_frame,
+            text="Cargar varios archivos (lote)",
+            command=self.cargar_lote,
+            style="GreenButton.TButton",
+        )
+        self.btn_lote.pack(pady=(0, 5), fill="x")
+
+        # Inventario actualizado: solo se aplican altas, cambios y bajas respecto de la BD
+        self.btn_reimportar = ttk.Button(
+            btn_excel_frame,
+            text="Reimportar inventario (incremental)",
+            command=self.reimportar,
+            style="GreenButton.TButton",
+        )
+        self.btn_reimportar.pack(pady=(0, 5), fill="x")
+
+        # Progreso de la carga (oculto hasta que se carga un archivo)
+        self.frame_progreso = ttk.Frame(btn_excel_frame)
+        self.barra_progreso = ttk.Progressbar(self.frame_progreso, mode="indeterminate")
+        self.barra_progreso.pack(side="left", fill="x", expand=True, padx=(0, 6))
+        self.lbl_progreso = ttk.Label(self.frame_progreso, text="", width=40)
+        self.lbl_progreso.pack(side="left", padx=6)
+        ttk.Button(
+            self.frame_progreso,
+            text="Cancelar",
+            command=self.cancelar_carga,
+            style="GreenButton.TButton",
+        ).pack(side="left")
 
         ttk.Label(self.root, text="Filtrar por ubicación:").pack()
         self.filtro_combo = ttk.Combobox(self.root, state="readonly")
@@ -175,123 +219,244 @@ class PlanMantenimientoApp:
         self.filtro_combo.pack(pady=5)
 
     def cargar_excel(self):
-        filepath = filedialog.askopenfilename(filetypes=[("Archivos Excel", "*.xlsx")])
+        if self._carga is not None:
+            return  # Ya hay una carga en curso
+        filepath = filedialog.askopenfilename(
+            filetypes=[("Excel o CSV", "*.xlsx *.csv"), ("Archivos Excel", "*.xlsx"), ("CSV", "*.csv")]
+        )
         if not filepath:
             return
-        try:
-            df = pd.read_excel(filepath)  # Excel tipo "equipos_mantenimiento_2026_limpio_desde_csv.xlsx"
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo leer el Excel:\n{e}")
-            return
+        self._iniciar_carga(self._trabajo_carga, filepath, None, None)
 
-        # Mapeo de cabeceras a nombres internos
-        column_map = {
-            "Equipo": "equipo",
-            "Marca": "marca",
-            "Modelo": "modelo",
-            "Codigo": "codigo",
-            "Código": "codigo",
-            "Ubicacion": "ubicacion",
-            "Ubicación": "ubicacion",
-            "Responsable": "responsable",
-            "Frecuencia (meses)": "frecuencia_meses",
-            "Fecha último mantenimiento": "ultimo_mantenimiento",  # texto dd/mm/yyyy
-        }
-
-        for orig, new in column_map.items():
-            if orig in df.columns:
-                df.rename(columns={orig: new}, inplace=True)
-
-        # Columnas requeridas
-        requeridas = [
-            "equipo",
-            "marca",
-            "modelo",
-            "codigo",
-            "ubicacion",
-            "responsable",
-            "frecuencia_meses",
-            "ultimo_mantenimiento",
-        ]
-        faltantes = [c for c in requeridas if c not in df.columns]
-        if faltantes:
-            messagebox.showerror("Error", f"Faltan columnas en el Excel: {', '.join(faltantes)}")
+    def reimportar(self):
+        if self._carga is not None:
             return
-
-        # Nos quedamos solo con lo que vamos a usar
-        self.df = df[requeridas].copy()
-
-        # Tipos de datos
-        self.df["equipo"] = self.df["equipo"].astype(str)
-        self.df["marca"] = self.df["marca"].astype(str)
-        self.df["modelo"] = self.df["modelo"].astype(str)
-        self.df["codigo"] = self.df["codigo"].astype(str)
-        self.df["ubicacion"] = self.df["ubicacion"].astype(str)
-        self.df["responsable"] = self.df["responsable"].astype(str)
-
-        # Frecuencia a número
-        self.df["frecuencia_meses"] = pd.to_numeric(self.df["frecuencia_meses"], errors="coerce")
-
-        # -------- Parseo de fecha para futuras bases tipo "limpio_desde_csv" --------
-        # La columna viene como texto dd/mm/yyyy o vacío
-        self.df["ultimo_mantenimiento"] = pd.to_datetime(
-            self.df["ultimo_mantenimiento"].astype(str).str.strip(),
-            format="%d/%m/%Y",
-            errors="coerce",       # valores inválidos -> NaT
+        if not self.plan_db:
+            messagebox.showwarning("Atención", "Primero abre o crea la base de datos a actualizar.")
+            return
+        filepath = filedialog.askopenfilename(
+            title="Inventario actualizado",
+            filetypes=[("Excel o CSV", "*.xlsx *.csv"), ("Archivos Excel", "*.xlsx"), ("CSV", "*.csv")],
         )
+        if not filepath:
+            return
+        # Por defecto las bajas se limitan a lo importado desde este mismo archivo (como cli --por-origen):
+        # en una BD cargada por lotes, reimportar un sitio no debe dar de baja los equipos de los demás
+        nombre = os.path.basename(filepath)
+        todos = messagebox.askyesno(
+            "Alcance de las bajas",
+            f"¿Dar de baja también los equipos importados desde OTROS archivos (o sin archivo de origen) "
+            f"que no estén en este inventario?\n\n"
+            f"No (recomendado): solo se dan de baja los equipos que vinieron de {nombre}.",
+            default="no",
+        )
+        self._iniciar_carga(self._trabajo_carga, filepath, self.plan_db, None if todos else {nombre})
 
-        # Calcular estado (Pendiente / Próximo / Al día)
-        def calcular_estado(row):
-            hoy = pd.Timestamp.today().normalize()
-
-            if pd.isna(row["ultimo_mantenimiento"]) or pd.isna(row["frecuencia_meses"]):
-                return "Pendiente"
+    def cargar_lote(self):
+        if self._carga is not None:
+            return
+        rutas = filedialog.askopenfilenames(
+            title="Selecciona los libros de equipos",
+            filetypes=[("Excel o CSV", "*.xlsx *.xlsm *.csv"), ("Todos los archivos", "*.*")],
+        )
+        if not rutas:
+            return
+        self._iniciar_carga(self._trabajo_lote, list(rutas), self.plan_db)
+
+    def _iniciar_carga(self, trabajo, *args):
+        # La lectura y el cálculo de estado corren en un hilo; la UI solo revisa la cola con after()
+        self._cancelar = threading.Event()
+        self._cola = queue.Queue()
+        self._carga = threading.Thread(
+            target=trabajo, args=args + (self._cancelar, self._cola), daemon=True
+        )
 
+        for btn in (self.btn_excel, self.btn_lote, self.btn_reimportar):
+            btn.state(["disabled"])
+        self.lbl_progreso.config(text="Leyendo archivo...")
+        self.frame_progreso.pack(fill="x", pady=(0, 5))
+        self.barra_progreso.start(15)
+
+        self._carga.start()
+        self._after_carga = self.root.after(100, self._revisar_carga)
+
+    @staticmethod
+    def _trabajo_carga(filepath, comparar_con, alcance, cancelar, cola):
+        """
+        Hilo de trabajo: NO toca widgets, solo deja mensajes en la cola.
+        comparar_con: ruta de BD para una reimportación incremental (se calculan las diferencias, no se aplican).
+        alcance: archivos cuyos equipos se pueden dar de baja (None = todos), ver diferencias_equipos.
+        """
+        try:
+            # Si el mismo archivo ya se importó, se reutiliza la versión normalizada en caché
             try:
-                meses = int(row["frecuencia_meses"])
-            except Exception:
-                return "Pendiente"
+                df = cache_equipos.obtener(filepath)
+            except OSError:
+                df = None
+
+            if df is None:
+                # Lectura por bloques: solo columnas requeridas, ya normalizadas (ver importacion.py)
+                df = importar_equipos(
+                    filepath,
+                    progreso=lambda filas, fps: cola.put(("progreso", filas, fps)),
+                    cancelar=cancelar,
+                )
+                if df is None:
+                    cola.put(("cancelado",))
+                    return
+                try:
+                    cache_equipos.guardar(filepath, df)
+                except OSError as e:
+                    print(f"[AVISO] No se pudo guardar la caché de {filepath}: {e}")
+
+            # Calcular estado (Pendiente / Próximo / Al día) sobre toda la columna de una vez
+            indice = PlanMantenimientoApp._preparar(df)
+            dif = (
+                diferencias_equipos(comparar_con, filas_inventario(df), alcance=alcance) if comparar_con else None
+            )
 
-            fecha_next = row["ultimo_mantenimiento"] + pd.DateOffset(months=meses)
+            if cancelar.is_set():
+                cola.put(("cancelado",))
+            else:
+                cola.put(("listo", indice, f"{len(df)} filas", dif))
+        except ValueError as e:
+            cola.put(("error", str(e)))
+        except Exception as e:
+            cola.put(("error", f"No se pudo leer el Excel:\n{e}"))
 
-            if fecha_next < hoy:
-                return "Pendiente"
-            elif (fecha_next - hoy).days <= 180:
-                return "Próximo"
+    @staticmethod
+    def _trabajo_lote(rutas, plan_db, cancelar, cola):
+        """Hilo de trabajo del lote: las hojas se leen en procesos aparte (importacion.importar_lote)."""
+        try:
+            res = importar_lote(
+                rutas,
+                progreso=lambda hechas, total, filas: cola.put(("progreso_lote", hechas, total, filas)),
+                cancelar=cancelar,
+            )
+            if res is None:
+                cola.put(("cancelado",))
+                return
+            df, errores = res
+            indice = PlanMantenimientoApp._preparar(df)
+
+            detalle = f"{len(df)} filas de {df['origen'].nunique()} hojas"
+            if plan_db:
+                # Todo el lote se registra en el maestro de equipos en una sola transacción
+                con_codigo = df[df["codigo"] != ""]
+                reg = guardar_equipos(plan_db, con_codigo.to_dict("records"))
+                detalle += (
+                    f"\n\nEquipos en la BD: {reg['insertados']} nuevos, "
+                    f"{reg['actualizados']} actualizados, {reg['omitidos']} sin cambios"
+                )
+            if errores:
+                lineas = [f"{origen}: {msg}" for origen, msg in errores[:10]]
+                extra = f"\n... y {len(errores) - 10} más" if len(errores) > 10 else ""
+                detalle += "\n\nHojas omitidas:\n" + "\n".join(lineas) + extra
+
+            if cancelar.is_set():
+                cola.put(("cancelado",))
             else:
-                return "Al día"
+                cola.put(("listo", indice, detalle, None))
+        except Exception as e:
+            cola.put(("error", f"No se pudo importar el lote:\n{e}"))
 
-        self.df["estado"] = self.df.apply(calcular_estado, axis=1)
+    @staticmethod
+    def _preparar(df):
+        """Estado, texto de fecha e índice por ubicación (fuera del hilo de Tk)."""
+        agregar_estado(df)
 
         # Columna SOLO para mostrar en listas (siempre dd/mm/yyyy)
-        self.df["ultimo_mantenimiento_str"] = (
-            self.df["ultimo_mantenimiento"]
+        df["ultimo_mantenimiento_str"] = (
+            df["ultimo_mantenimiento"]
                 .dt.strftime("%d/%m/%Y")
                 .fillna("")
         )
+        # Partición por ubicación (se arma una vez por carga)
+        return IndiceUbicaciones(df, textos_disp)
+
+    def _revisar_carga(self):
+        """Corre en el hilo de Tk: procesa los mensajes del hilo de trabajo."""
+        self._after_carga = None
+        filas, fps = None, None
+        while True:
+            try:
+                msg = self._cola.get_nowait()
+            except queue.Empty:
+                break
 
-        # Llenar combo de ubicaciones
-        ubicaciones = sorted(self.df["ubicacion"].dropna().astype(str).unique())
-        self.filtro_combo["values"] = ubicaciones
-        self.filtro_combo.set("Selecciona una ubicación")
+            if msg[0] == "progreso":
+                _, filas, fps = msg
+                continue
+            if msg[0] == "progreso_lote":
+                _, hechas, total, leidas = msg
+                self.lbl_progreso.config(text=f"{hechas}/{total} hojas, {leidas} filas")
+                continue
 
-        messagebox.showinfo("Éxito", "Base cargada correctamente.")
+            self._fin_carga()
+            if msg[0] == "listo":
+                self.indice = msg[1]
+                self.df = self.indice.df
+                self.filas_filtradas = None
+                self.lista_equipos.set_datos([], [])
+
+                # Llenar combo de ubicaciones
+                self.filtro_combo["values"] = self.indice.ubicaciones()
+                self.filtro_combo.set("Selecciona una ubicación")
+
+                if msg[3] is not None:
+                    self._confirmar_diferencias(msg[3])
+                else:
+                    messagebox.showinfo("Éxito", f"Base cargada correctamente.\n{msg[2]}")
+            elif msg[0] == "error":
+                messagebox.showerror("Error", msg[1])
+            return
 
-    # Helper para texto en Listbox
-    def _format_disp(self, row):
-        return (
-            f"{row['equipo']} | {row['marca']} | {row['modelo']} | "
-            f"{row['codigo']} | {row['ubicacion']} | "
-            f"{row['ultimo_mantenimiento_str']} | {row['estado']}"
+        if filas is not None:
+            self.lbl_progreso.config(text=f"{filas} filas leídas ({fps:.0f} filas/s)")
+        self._after_carga = self.root.after(100, self._revisar_carga)
+
+    def _confirmar_diferencias(self, dif):
+        """Muestra el resumen de la reimportación y, si el usuario acepta, lo aplica en una transacción."""
+        cambios = len(dif["nuevos"]) + len(dif["modificados"]) + len(dif["retirados"])
+        resumen = (
+            f"Nuevos: {len(dif['nuevos'])}\n"
+            f"Modificados: {len(dif['modificados'])}\n"
+            f"Dados de baja (ya no están en el inventario): {len(dif['retirados'])}\n"
+            f"Sin cambios: {dif['sin_cambios']}"
         )
+        if not cambios:
+            messagebox.showinfo("Reimportación", "El inventario no tiene cambios.\n\n" + resumen)
+            return
+        if dif["retirados"]:
+            muestra = ", ".join(dif["retirados"][:10]) + (" ..." if len(dif["retirados"]) > 10 else "")
+            resumen += f"\n\nBajas: {muestra}"
+        if not messagebox.askyesno("Reimportación", resumen + "\n\n¿Aplicar estos cambios a la BD?"):
+            return
+        try:
+            aplicar_diferencias(self.plan_db, dif)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron aplicar los cambios:\n{e}")
+            return
+        messagebox.showinfo("Reimportación", f"Se aplicaron {cambios} cambios en:\n{self.plan_db}")
+
+    def cancelar_carga(self):
+        if self._cancelar is not None:
+            self._cancelar.set()
+            self.lbl_progreso.config(text="Cancelando...")
+
+    def _fin_carga(self):
+        self.barra_progreso.stop()
+        self.frame_progreso.pack_forget()
+        for btn in (self.btn_excel, self.btn_lote, self.btn_reimportar):
+            btn.state(["!disabled"])
+        self._carga = None
 
     def filtrar(self, event=None):
+        if self.indice is None:
+            return
         ubic = self.filtro_combo.get()
-        self.df_filtrada = self.df[self.df["ubicacion"].astype(str) == str(ubic)]
-        self.lista_equipos.delete(0, END)
-        for _, row in self.df_filtrada.iterrows():
-            disp = self._format_disp(row)
-            self.lista_equipos.insert(END, disp)
+        self.filas_filtradas = self.indice.filas(ubic)
+        self.lista_equipos.set_datos(self.filas_filtradas, self.indice.textos(ubic))
 
     # ---------------- Listas ----------------
     def _crear_listas(self):
@@ -299,15 +464,11 @@ class PlanMantenimientoApp:
         frame.pack(pady=10, fill="both", expand=True)
 
         # Lista izquierda
+        # Listas virtualizadas: solo se dibujan las filas visibles (ver widgets.py)
         frame_izq = ttk.Frame(frame)
         frame_izq.grid(row=0, column=0, padx=10)
-        scroll_izq = ttk.Scrollbar(frame_izq, orient="vertical")
-        self.lista_equipos = Listbox(
-            frame_izq, selectmode="multiple", width=90, height=15, yscrollcommand=scroll_izq.set
-        )
-        scroll_izq.config(command=self.lista_equipos.yview)
+        self.lista_equipos = ListaVirtual(frame_izq, width=90, height=15)
         self.lista_equipos.pack(side="left", fill="both")
-        scroll_izq.pack(side="right", fill="y")
 
         # Botones centro
         mid = ttk.Frame(frame)
@@ -328,13 +489,9 @@ class PlanMantenimientoApp:
         # Lista derecha
         frame_der = ttk.Frame(frame)
         frame_der.grid(row=0, column=2, padx=10)
-        scroll_der = ttk.Scrollbar(frame_der, orient="vertical")
-        self.lista_sel = Listbox(
-            frame_der, selectmode="multiple", width=90, height=15, yscrollcommand=scroll_der.set
-        )
-        scroll_der.config(command=self.lista_sel.yview)
+        self.lista_sel = ListaVirtual(frame_der, width=90, height=15)
         self.lista_sel.pack(side="left", fill="both")
-        scroll_der.pack(side="right", fill="y")
+        self.lista_sel.set_datos(self.seleccion.claves(), self.seleccion.texto)
 
         # Frame inferior para botones de ancho igual
         btns_bottom = ttk.Frame(self.root)
@@ -362,38 +519,40 @@ class PlanMantenimientoApp:
         ).pack(pady=5)
 
     def agregar(self):
-        seleccion_indices = self.lista_equipos.curselection()
-        if not hasattr(self, "df_filtrada") or self.df_filtrada is None:
+        if self.filas_filtradas is None:
             messagebox.showwarning("Atención", "Primero filtra por ubicación y selecciona equipos.")
             return
 
-        mapa_disp_row = {}
-        for _, row in self.df_filtrada.iterrows():
-            disp = self._format_disp(row)
-            mapa_disp_row[disp] = row
-
-        for i in seleccion_indices:
-            val = self.lista_equipos.get(i)
-            if val not in self.equipos_seleccionados:
-                self.equipos_seleccionados.append(val)
-                self.lista_sel.insert(END, val)
-            if val not in self.item_rows and val in mapa_disp_row:
-                self.item_rows[val] = mapa_disp_row[val]
+        # La lista virtual devuelve claves de fila (etiquetas de self.df), no posiciones
+        etiquetas = self.lista_equipos.seleccion()
+        if not etiquetas:
+            return
+        _, sin_codigo = self.seleccion.agregar(
+            self.df.loc[etiquetas], [self.indice.texto(e) for e in etiquetas]
+        )
+        self.lista_sel.refrescar()
+        if sin_codigo:
+            messagebox.showwarning(
+                "Atención", f"Se omitieron {sin_codigo} equipo(s) sin código: no se pueden guardar en el plan."
+            )
 
     def eliminar(self):
-        for i in reversed(self.lista_sel.curselection()):
-            val = self.lista_sel.get(i)
-            if val in self.equipos_seleccionados:
-                self.equipos_seleccionados.remove(val)
-            self.lista_sel.delete(i)
+        self.seleccion.quitar(self.lista_sel.seleccion())
+        self.lista_sel.limpiar_seleccion()
+        self.lista_sel.refrescar()
 
     def volver(self):
+        # Si hay una carga en curso, se cancela y se deja de revisar su cola
+        if self._cancelar is not None:
+            self._cancelar.set()
+        if self._after_carga is not None:
+            self.root.after_cancel(self._after_carga)
         self.root.destroy()
         self.menu_root.deiconify()
 
     # ---------------- Fechas ----------------
     def asignar_fechas(self):
-        if not self.equipos_seleccionados:
+        if not len(self.seleccion):
             messagebox.showwarning("Atención", "Selecciona al menos un equipo.")
             return
         self.abrir_fechas()
@@ -401,36 +560,94 @@ class PlanMantenimientoApp:
     def abrir_fechas(self):
         v = Toplevel(self.root)
         v.title("Asignar fechas tentativas")
-        v.geometry("900x520")
-
-        cont = ttk.Frame(v)
-        cont.pack(fill="both", expand=True)
-        canvas = Canvas(cont, highlightthickness=0)
-        scroll = ttk.Scrollbar(cont, orient="vertical", command=canvas.yview)
-        canvas.configure(yscrollcommand=scroll.set)
-        scroll.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True)
-        inner = ttk.Frame(canvas)
-        canvas.create_window((0, 0), window=inner, anchor="nw")
-        inner.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-
-        ttk.Label(inner, text="Equipo", font=("Arial", 10, "bold")).grid(
-            row=0, column=0, padx=8, pady=6, sticky="w"
-        )
-        ttk.Label(inner, text="Fecha (dd/mm/yyyy)", font=("Arial", 10, "bold")).grid(
-            row=0, column=1, padx=8, pady=6, sticky="w"
-        )
+        v.geometry("900x620")
 
-        self.entries = {}
+        # Las fechas viven en un dict por código; la grilla solo crea widgets para las filas visibles
         def_fecha = dt.date.today().strftime("%d/%m/%Y")
-        for i, disp in enumerate(self.equipos_seleccionados, start=1):
-            ttk.Label(inner, text=disp, wraplength=520, justify="left").grid(
-                row=i, column=0, sticky="w", padx=8, pady=4
-            )
-            e = ttk.Entry(inner, width=18)
-            e.grid(row=i, column=1, sticky="w", padx=8, pady=4)
-            e.insert(0, def_fecha)
-            self.entries[disp] = e
+        self.fechas = {codigo: def_fecha for codigo in self.seleccion}
+        codigos = list(self.seleccion)
+
+        # ----- Acciones masivas -----
+        acciones = ttk.LabelFrame(v, text="Acciones masivas")
+        acciones.pack(fill="x", padx=8, pady=6)
+
+        ubicaciones = sorted({str(self.seleccion.fila(c)["ubicacion"]) for c in codigos})
+        ttk.Label(acciones, text="Ubicación:").grid(row=0, column=0, padx=4, pady=4, sticky="e")
+        combo_ubic = ttk.Combobox(acciones, state="readonly", values=["Todas"] + ubicaciones, width=30)
+        combo_ubic.set("Todas")
+        combo_ubic.grid(row=0, column=1, padx=4, pady=4, sticky="w")
+
+        ttk.Label(acciones, text="Fecha:").grid(row=0, column=2, padx=4, pady=4, sticky="e")
+        ent_fecha = ttk.Entry(acciones, width=12)
+        ent_fecha.insert(0, def_fecha)
+        ent_fecha.grid(row=0, column=3, padx=4, pady=4, sticky="w")
+
+        ttk.Label(acciones, text="Repartir en").grid(row=1, column=2, padx=4, pady=4, sticky="e")
+        spin_semanas = Spinbox(acciones, from_=1, to=52, width=5)
+        spin_semanas.delete(0, END)
+        spin_semanas.insert(0, "4")
+        spin_semanas.grid(row=1, column=3, padx=4, pady=4, sticky="w")
+        ttk.Label(acciones, text="semanas desde la fecha").grid(row=1, column=4, padx=4, pady=4, sticky="w")
+
+        def codigos_objetivo():
+            ubic = combo_ubic.get()
+            if ubic == "Todas":
+                return codigos
+            return [c for c in codigos if str(self.seleccion.fila(c)["ubicacion"]) == ubic]
+
+        def fecha_base():
+            try:
+                texto = fecha_a_iso(ent_fecha.get())
+                if texto is None:
+                    raise ValueError("Falta la fecha")
+                return dt.date.fromisoformat(texto)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=v)
+                return None
+
+        def aplicar_fecha():
+            base = fecha_base()
+            if base is None:
+                return
+            texto = base.strftime("%d/%m/%Y")
+            for c in codigos_objetivo():
+                self.fechas[c] = texto
+            grilla.refrescar()
+
+        def repartir():
+            base = fecha_base()
+            if base is None:
+                return
+            try:
+                semanas = max(1, int(spin_semanas.get()))
+            except ValueError:
+                messagebox.showerror("Error", "Número de semanas inválido.", parent=v)
+                return
+            objetivo = codigos_objetivo()
+            n = len(objetivo)
+            # Bloques consecutivos del mismo tamaño (±1) en cada semana
+            for i, c in enumerate(objetivo):
+                semana = i * semanas // n
+                self.fechas[c] = (base + dt.timedelta(weeks=semana)).strftime("%d/%m/%Y")
+            grilla.refrescar()
+
+        ttk.Button(
+            acciones, text="Aplicar fecha", command=aplicar_fecha, style="GreenButton.TButton"
+        ).grid(row=0, column=4, padx=4, pady=4, sticky="w")
+        ttk.Button(
+            acciones, text="Repartir", command=repartir, style="GreenButton.TButton"
+        ).grid(row=1, column=5, padx=4, pady=4, sticky="w")
+
+        # ----- Grilla -----
+        grilla = GrillaEditable(
+            v,
+            codigos,
+            self.seleccion.texto,
+            self.fechas,
+            titulo_texto="Equipo",
+            titulo_valor="Fecha (dd/mm/yyyy)",
+        )
+        grilla.pack(fill="both", expand=True, padx=8)
 
         ttk.Button(
             v,
@@ -441,58 +658,51 @@ class PlanMantenimientoApp:
 
     # ---------------- Guardar ----------------
     def guardar(self):
-        ensure_table(self.plan_db)
-        conn = sqlite3.connect(self.plan_db)
-        cur = conn.cursor()
-
-        for disp, ent in self.entries.items():
-            fecha = ent.get().strip()
-
-            row = self.item_rows.get(disp, None)
-
-            if row is None and hasattr(self, "df") and self.df is not None:
-                partes = [p.strip() for p in disp.split("|")]
-                if len(partes) >= 5:
-                    eq, ma, mo, co, ub = partes[:5]
-                    filtro = (
-                        (self.df["equipo"].astype(str).str.strip() == eq)
-                        & (self.df["marca"].astype(str).str.strip() == ma)
-                        & (self.df["modelo"].astype(str).str.strip() == mo)
-                        & (self.df["codigo"].astype(str).str.strip() == co)
-                        & (self.df["ubicacion"].astype(str).str.strip() == ub)
-                    )
-                    encontrados = self.df[filtro]
-                    if not encontrados.empty:
-                        row = encontrados.iloc[0]
-
-            if row is None:
-                print(f"[AVISO] No se encontró información para: {disp}. Se omite este equipo.")
+        # 1) Validar todas las fechas antes de escribir nada
+        filas, errores = [], []
+        for codigo, texto in self.fechas.items():
+            if codigo not in self.seleccion:
+                continue  # Se quitó de la selección con la ventana de fechas abierta
+            try:
+                fecha = fecha_a_iso(texto)  # dd/mm/yyyy en pantalla, ISO en la BD
+                if fecha is None:
+                    raise ValueError("Falta la fecha")
+            except ValueError as e:
+                errores.append(f"{codigo}: {e}")
                 continue
-
-            vals = {
+            row = self.seleccion.fila(codigo)
+            filas.append({
                 "equipo": str(row["equipo"]),
                 "marca": str(row["marca"]),
                 "modelo": str(row["modelo"]),
-                "codigo": str(row["codigo"]),
+                "codigo": codigo,
                 "ubicacion": str(row["ubicacion"]),
                 "responsable": str(row.get("responsable", "")),
-                "fecha_tentativa": str(fecha),
-                "cumplido": 0,
-                "fecha_cumplimiento": None,
-            }
-
-            cur.execute(
-                f"""
-                INSERT INTO {PLAN_TABLE}
-                (equipo, marca, modelo, codigo, ubicacion, responsable, fecha_tentativa, cumplido, fecha_cumplimiento)
-                VALUES (:equipo, :marca, :modelo, :codigo, :ubicacion, :responsable, :fecha_tentativa, :cumplido, :fecha_cumplimiento)
-                """,
-                vals,
-            )
+                "origen": str(row.get("origen", "")),
+                "ultimo_mantenimiento": row.get("ultimo_mantenimiento"),   # Timestamp/NaT: database lo pasa a ISO
+                "frecuencia_meses": row.get("frecuencia_meses"),
+                "fecha_tentativa": fecha,
+            })
+
+        if errores:
+            extra = f"\n... y {len(errores) - 10} más" if len(errores) > 10 else ""
+            messagebox.showerror("Fechas inválidas", "\n".join(errores[:10]) + extra)
+            return
 
-        conn.commit()
-        conn.close()
-        messagebox.showinfo("Éxito", f"Plan guardado en:\n{self.plan_db}")
+        # 2) Un solo executemany + UPSERT en una transacción (ver database.guardar_plan)
+        try:
+            res = guardar_plan(self.plan_db, filas)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo guardar el plan:\n{e}")
+            return
+
+        messagebox.showinfo(
+            "Éxito",
+            f"Plan guardado en:\n{self.plan_db}\n\n"
+            f"Nuevos: {res['insertados']}\n"
+            f"Actualizados: {res['actualizados']}\n"
+            f"Sin cambios (ya estaban): {res['omitidos']}",
+        )
 
     # ---------------- Ver plan ----------------
     # Programamción cuando se da click en ver plan
@@ -513,9 +723,6 @@ class PlanMantenimientoApp:
             "cumplido",
             "fecha_cumplimiento",
         )
-        tree = ttk.Treeview(v, columns=cols, show="headings", selectmode="extended")
-        tree.pack(fill="both", expand=True)
-
         labels = [
             "ID",
             "Equipo",
@@ -528,23 +735,103 @@ class PlanMantenimientoApp:
             "Cumplido",
             "Fecha Cumpl.",
         ]
-        for c, l in zip(cols, labels):
-            tree.heading(c, text=l)
-            tree.column(c, width=120 if c != "id" else 60, anchor="w")
-
-        conn = sqlite3.connect(self.plan_db)
-        cur = conn.cursor()
-        cur.execute(
-            f"""
-            SELECT id, equipo, marca, modelo, codigo, ubicacion, responsable, fecha_tentativa, cumplido, fecha_cumplimiento
-            FROM {PLAN_TABLE}
-            """
+
+        ensure_table(self.plan_db)
+
+        # Las filas se piden por páginas a SQLite; ordenar y filtrar también se resuelve en SQL
+        consulta = ConsultaPaginada(
+            self.plan_db,
+            cols,
+            expresiones={
+                "fecha_tentativa": sql_fecha_ui("fecha_tentativa"),
+                "fecha_cumplimiento": sql_fecha_ui("fecha_cumplimiento"),
+            },
+        )
+        consulta.ordenar("fecha_tentativa", descendente=False)
+
+        # ----- Barra de filtros -----
+        barra = ttk.Frame(v)
+        barra.pack(fill="x", padx=8, pady=6)
+
+        ttk.Label(barra, text="Buscar:").pack(side="left", padx=(0, 4))
+        # Búsqueda mientras se escribe (FTS5); la lista desplegable sugiere los equipos más relevantes
+        ent_texto = CampoBusqueda(
+            barra,
+            lambda texto: [
+                (codigo, f"{codigo} — {equipo} ({ubicacion})")
+                for _id, codigo, equipo, _marca, _modelo, ubicacion in buscar_equipos(self.plan_db, texto, limite=15)
+            ],
+            lambda: aplicar_filtros(),
+            width=20,
+        )
+        ent_texto.pack(side="left", padx=4)
+
+        ttk.Label(barra, text="Ubicación:").pack(side="left", padx=(8, 4))
+        combo_ubic = ttk.Combobox(
+            barra, state="readonly", width=24,
+            values=["Todas"] + valores_distintos(self.plan_db, "ubicacion"),
+        )
+        combo_ubic.set("Todas")
+        combo_ubic.pack(side="left", padx=4)
+
+        ttk.Label(barra, text="Cumplido:").pack(side="left", padx=(8, 4))
+        combo_cumplido = ttk.Combobox(barra, state="readonly", width=6, values=["Todos", "Sí", "No"])
+        combo_cumplido.set("Todos")
+        combo_cumplido.pack(side="left", padx=4)
+
+        ttk.Label(barra, text="Desde:").pack(side="left", padx=(8, 4))
+        ent_desde = ttk.Entry(barra, width=11)
+        ent_desde.pack(side="left", padx=4)
+        ttk.Label(barra, text="Hasta:").pack(side="left", padx=(8, 4))
+        ent_hasta = ttk.Entry(barra, width=11)
+        ent_hasta.pack(side="left", padx=4)
+
+        lbl_total = ttk.Label(barra, text="")
+        lbl_total.pack(side="right", padx=4)
+
+        tabla = TablaPaginada(
+            v, consulta, labels, anchos={c: (60 if c == "id" else 120) for c in cols}
+        )
+        tabla.pack(fill="both", expand=True)
+        tree = tabla.tree
+
+        def aplicar_filtros(event=None):
+            ubic = combo_ubic.get()
+            cumplido = {"Sí": 1, "No": 0}.get(combo_cumplido.get())
+            try:
+                filtros = filtros_plan(
+                    texto=ent_texto.get(),
+                    ubicacion="" if ubic == "Todas" else ubic,
+                    cumplido=cumplido,
+                    desde=ent_desde.get(),
+                    hasta=ent_hasta.get(),
+                )
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=v)
+                return
+            consulta.filtrar(filtros)
+            tabla.recargar()
+            lbl_total.config(text=f"{consulta.contar()} registro(s)")
+
+        def limpiar_filtros():
+            for ent in (ent_texto, ent_desde, ent_hasta):
+                ent.delete(0, END)
+            combo_ubic.set("Todas")
+            combo_cumplido.set("Todos")
+            aplicar_filtros()
+
+        ttk.Button(barra, text="Filtrar", command=aplicar_filtros, style="GreenButton.TButton").pack(
+            side="left", padx=4
+        )
+        ttk.Button(barra, text="Limpiar", command=limpiar_filtros, style="GreenButton.TButton").pack(
+            side="left", padx=4
         )
-        rows = cur.fetchall()
-        conn.close()
+        for w in (ent_texto, ent_desde, ent_hasta):
+            w.bind("<Return>", aplicar_filtros)
+        for w in (combo_ubic, combo_cumplido):
+            w.bind("<<ComboboxSelected>>", aplicar_filtros)
 
-        for r in rows:
-            tree.insert("", END, values=r)
+        aplicar_filtros()
 
         frame_btn = ttk.Frame(v)
         frame_btn.pack(pady=10)
@@ -562,19 +849,41 @@ class PlanMantenimientoApp:
             if not confirm:
                 return
 
-            conn = sqlite3.connect(self.plan_db)
-            cur = conn.cursor()
-            eliminados = 0
-            for item in seleccion:
-                data = tree.item(item, "values")
-                record_id = data[0]
-                cur.execute(f"DELETE FROM {PLAN_TABLE} WHERE id = ?", (record_id,))
-                eliminados += 1
-                tree.delete(item)
-            conn.commit()
-            conn.close()
+            # Un solo DELETE por conjunto de ids (iid = id en la BD); las filas quedan en la papelera
+            try:
+                lote, eliminados = eliminar_plan(self.plan_db, [int(item) for item in seleccion])
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudieron eliminar los registros:\n{e}", parent=v)
+                return
+
+            # Se desenganchan de la tabla en una sola llamada; se guardan sus posiciones para deshacer
+            deshacer["lote"] = lote
+            deshacer["items"] = tabla.desenganchar(seleccion)
+            btn_deshacer.state(["!disabled"])
+            lbl_total.config(text=f"{consulta.contar()} registro(s)")
+
+            messagebox.showinfo("Éxito", f"Se eliminaron {eliminados} registro(s) correctamente.", parent=v)
 
-            messagebox.showinfo("Éxito", f"Se eliminaron {eliminados} registro(s) correctamente.")
+        def deshacer_eliminar():
+            if deshacer["lote"] is None:
+                return
+            try:
+                restaurados = deshacer_eliminacion(self.plan_db, deshacer["lote"])
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo deshacer:\n{e}", parent=v)
+                return
+
+            # Si no volvieron todas (el mismo equipo y fecha se guardó de nuevo) o la tabla se recargó
+            # mientras tanto, se vuelve a pedir a la BD en lugar de reenganchar filas que no existen
+            if restaurados < len(deshacer["items"]) or not tabla.reenganchar(deshacer["items"]):
+                tabla.recargar()
+            deshacer["lote"], deshacer["items"] = None, []
+            btn_deshacer.state(["disabled"])
+            lbl_total.config(text=f"{consulta.contar()} registro(s)")
+
+            messagebox.showinfo("Deshacer", f"Se restauraron {restaurados} registro(s).", parent=v)
+
+        deshacer = {"lote": None, "items": []}
 
         ttk.Button(
             frame_btn,
@@ -582,6 +891,14 @@ class PlanMantenimientoApp:
             command=eliminar_seleccionados,
             style="GreenButton.TButton",
         ).pack(side="left", padx=5)
+        btn_deshacer = ttk.Button(
+            frame_btn,
+            text="↶ Deshacer eliminación",
+            command=deshacer_eliminar,
+            style="GreenButton.TButton",
+        )
+        btn_deshacer.pack(side="left", padx=5)
+        btn_deshacer.state(["disabled"])
         ttk.Button(
             frame_btn,
             text="⬅ Cerrar",
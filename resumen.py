@@ -0,0 +1,81 @@
+# Indicadores del plan (totales, atrasados, próximos del mes) calculados en SQLite. No depende de tkinter:
+# lo usan la ventana ResumenInsightsApp y la línea de comandos (cli.py).
+
+import pandas as pd
+import datetime as dt
+from database import ensure_table, get_connection, sql_fecha_ui, PLAN_TABLE, EQUIPOS_TABLE
+
+
+# Columnas que se muestran en los listados de atrasados / próximos
+COLS_LISTA = ["equipo", "marca", "modelo", "codigo", "ubicacion", "fecha_tentativa"]
+DIAS_POR_VENCER = 90                                                                # Horizonte de "vence pronto"
+
+
+def consultar_plan(conn, where: str, params=()) -> pd.DataFrame:
+    """
+    Trae solo las filas que cumplen `where`; el filtrado lo hace SQLite con sus índices.
+    El ORDER BY va calificado: sin tabla, usaría el alias dd/mm/yyyy y ordenaría como texto.
+    """
+    return pd.read_sql_query(
+        f"""
+        SELECT equipo, marca, modelo, codigo, ubicacion,
+               {sql_fecha_ui("fecha_tentativa")} AS fecha_tentativa
+        FROM {PLAN_TABLE}
+        WHERE {where}
+        ORDER BY {PLAN_TABLE}.fecha_tentativa, id
+        """,
+        conn,
+        params=params,
+    )
+
+
+def equipos_por_vencer(conn, desde, hasta) -> pd.DataFrame:
+    """Equipos activos cuyo próximo mantenimiento cae en [desde, hasta]: un rango sobre idx_equipos_proximo."""
+    return pd.read_sql_query(
+        f"""
+        SELECT equipo, marca, modelo, codigo, ubicacion,
+               {sql_fecha_ui("proximo_mantenimiento")} AS proximo_mantenimiento
+        FROM {EQUIPOS_TABLE}
+        WHERE retirado = 0 AND proximo_mantenimiento BETWEEN ? AND ?
+        ORDER BY {EQUIPOS_TABLE}.proximo_mantenimiento
+        """,
+        conn,
+        params=(desde.isoformat(), hasta.isoformat()),
+    )
+
+
+def resumen_plan(db_path, hoy=None, dias=DIAS_POR_VENCER) -> dict:
+    """
+    Devuelve {"total", "cumplidos", "pendientes", "porcentaje", "atrasados", "proximos", "por_vencer"},
+    solo de equipos vigentes (los dados de baja en una reimportación no cuentan);
+    atrasados y proximos (pendientes de este mes) son DataFrames con COLS_LISTA; por_vencer, los equipos
+    cuyo próximo mantenimiento (último + frecuencia) vence en los próximos `dias` días.
+    """
+    ensure_table(db_path)
+    conn = get_connection(db_path)
+    total, cumplidos = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(cumplido), 0) FROM {PLAN_TABLE} WHERE retirado = 0"
+    ).fetchone()
+
+    # Fechas ISO: "atrasados" y "este mes" son rangos sobre el índice (cumplido, fecha_tentativa)
+    hoy = hoy or dt.date.today()
+    inicio_mes = hoy.replace(day=1)
+    inicio_mes_sig = (inicio_mes + dt.timedelta(days=32)).replace(day=1)
+    atrasados = consultar_plan(
+        conn, "retirado = 0 AND cumplido = 0 AND fecha_tentativa < ?", (hoy.isoformat(),)
+    )
+    proximos = consultar_plan(
+        conn,
+        "retirado = 0 AND cumplido = 0 AND fecha_tentativa >= ? AND fecha_tentativa < ?",
+        (inicio_mes.isoformat(), inicio_mes_sig.isoformat()),
+    )
+    por_vencer = equipos_por_vencer(conn, hoy, hoy + dt.timedelta(days=dias))
+    return {
+        "total": total,
+        "cumplidos": cumplidos,
+        "pendientes": total - cumplidos,
+        "porcentaje": (cumplidos / total * 100) if total > 0 else 0,
+        "atrasados": atrasados,
+        "proximos": proximos,
+        "por_vencer": por_vencer,
+    }
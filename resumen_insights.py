@@ -1,8 +1,6 @@
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
-import sqlite3
-from database import PLAN_TABLE
+from resumen import resumen_plan, DIAS_POR_VENCER
 
 
 class ResumenInsightsApp:
@@ -113,55 +111,36 @@ class ResumenInsightsApp:
         self.lbl_bd.config(text=f"BD: {path.split('/')[-1]}")
 
         try:
-            conn = sqlite3.connect(path)
-            df = pd.read_sql_query(f"SELECT * FROM {PLAN_TABLE}", conn)
-            conn.close()
+            res = resumen_plan(path)
         except Exception as e:
             messagebox.showerror(
                 "Error",
                 f"No se pudo leer la base de datos:\n{e}"
             )
             return
-
-        if df.empty:
+        if res["total"] == 0:
             messagebox.showwarning("Aviso", "La base de datos está vacía.")
             return
 
-        self.mostrar_insights(df)
+        self.mostrar_insights(res["total"], res["cumplidos"], res["atrasados"], res["proximos"], res["por_vencer"])
 
     # ---------- Mostrar insights ----------
-    def mostrar_insights(self, df):
+    def mostrar_insights(self, total, cumplidos, atrasados, proximos, por_vencer):
         # Limpiar frame central
         for w in self.frame_info.winfo_children():
             w.destroy()
 
-        # Asegurar tipo fecha
-        df["fecha_tentativa"] = pd.to_datetime(
-            df["fecha_tentativa"],
-            errors="coerce",
-            dayfirst=True
-        )
-        hoy = pd.Timestamp.today()
-
-        total = len(df)
-        cumplidos = df["cumplido"].sum()
         pendientes = total - cumplidos
         porc = (cumplidos / total * 100) if total > 0 else 0
 
-        atrasados = df[(df["cumplido"] == 0) & (df["fecha_tentativa"] < hoy)]
-        proximos = df[
-            (df["cumplido"] == 0)
-            & (df["fecha_tentativa"].dt.month == hoy.month)
-            & (df["fecha_tentativa"].dt.year == hoy.year)
-        ]
-
         resumen = (
             f"🧾 Total de equipos: {total}\n"
             f"✅ Cumplidos: {cumplidos}\n"
             f"⏳ Pendientes: {pendientes}\n"
             f"📈 Porcentaje de cumplimiento: {porc:.1f}%\n"
             f"⚠️ Atrasados: {len(atrasados)}\n"
-            f"🗓 Próximos este mes: {len(proximos)}"
+            f"🗓 Próximos este mes: {len(proximos)}\n"
+            f"🔔 Vencen en {DIAS_POR_VENCER} días: {len(por_vencer)}"
         )
 
         # Título "Resumen General" centrado
@@ -175,7 +154,7 @@ class ResumenInsightsApp:
         # Texto centrado y con fuente que muestra emojis a color (en Windows)
         text = Text(
             self.frame_info,
-            height=8,
+            height=9,
             wrap="word",
             bg="#FFFFFF",
             font=("Segoe UI Emoji", 15),
@@ -208,6 +187,13 @@ class ResumenInsightsApp:
             style="GreenButton.TButton"
         ).pack(side="left", padx=5, fill="x", expand=True)
 
+        ttk.Button(
+            btn_frame,
+            text="Ver Por Vencer",
+            command=lambda: self.mostrar_lista(por_vencer, f"Vencen en {DIAS_POR_VENCER} días"),
+            style="GreenButton.TButton"
+        ).pack(side="left", padx=5, fill="x", expand=True)
+
     # ---------- Ventana con listado ----------
     def mostrar_lista(self, df_sub, titulo):
         if df_sub.empty:
@@ -237,7 +223,7 @@ class ResumenInsightsApp:
         frame_tabla = ttk.Frame(frame_main)
         frame_tabla.pack(fill="both", expand=True)
 
-        cols = ["equipo", "marca", "modelo", "codigo", "ubicacion", "fecha_tentativa"]
+        cols = list(df_sub.columns)  # COLS_LISTA, o proximo_mantenimiento en lugar de fecha_tentativa
         tree = ttk.Treeview(frame_tabla, columns=cols, show="headings")
 
         # Scroll vertical
@@ -248,7 +234,7 @@ class ResumenInsightsApp:
         tree.pack(side="left", fill="both", expand=True)
 
         for c in cols:
-            tree.heading(c, text=c.capitalize())
+            tree.heading(c, text=c.replace("_", " ").capitalize())
             tree.column(c, width=120, anchor="w")
 
         for _, row in df_sub.iterrows():
@@ -0,0 +1,506 @@
+# Componentes Tk reutilizables para listas grandes.
+
+from tkinter import *
+from tkinter import ttk
+import tkinter.font as tkfont
+
+
+def con_retraso(widget, funcion, ms=250):
+    """
+    Devuelve un manejador (de eventos o de trace de una variable) que llama a funcion() recién cuando
+    pasan ms milisegundos sin otra llamada (p. ej. buscar mientras se escribe sin consultar en cada tecla).
+    """
+    pendiente = None
+
+    def manejador(*_):
+        nonlocal pendiente
+        if pendiente is not None:
+            widget.after_cancel(pendiente)
+        pendiente = widget.after(ms, ejecutar)
+
+    def ejecutar():
+        nonlocal pendiente
+        pendiente = None
+        funcion()
+
+    return manejador
+
+
+class CampoBusqueda(ttk.Combobox):
+    """
+    Cuadro de búsqueda mientras se escribe: con retraso tras cada cambio pide sugerencias y avisa que hay
+    que volver a filtrar. Las sugerencias aparecen en la lista desplegable (flecha abajo); al elegir una,
+    el texto pasa a ser su valor (p. ej. el código del equipo).
+
+    sugerir(texto) -> [(valor, etiqueta)]; al_cambiar(): se llama después de actualizar las sugerencias.
+    """
+
+    def __init__(self, master, sugerir, al_cambiar, ms=250, **kw):
+        self.var = StringVar()
+        super().__init__(master, textvariable=self.var, **kw)
+        self._sugerir = sugerir
+        self._al_cambiar = al_cambiar
+        self._valores = {}              # etiqueta -> valor
+        self.var.trace_add("write", con_retraso(self, self._actualizar, ms))
+        self.bind("<<ComboboxSelected>>", self._on_elegir)
+
+    def _actualizar(self):
+        sugerencias = self._sugerir(self.var.get())
+        self._valores = {etiqueta: valor for valor, etiqueta in sugerencias}
+        self.config(values=[etiqueta for _, etiqueta in sugerencias])
+        self._al_cambiar()
+
+    def _on_elegir(self, event=None):
+        valor = self._valores.get(self.var.get())
+        if valor is not None:
+            self.var.set(valor)
+
+
+class ListaVirtual(ttk.Frame):
+    """
+    Listbox virtualizado: solo existen en Tk las filas visibles; el resto se pide a la fuente de datos
+    al hacer scroll. La selección (múltiple) se guarda por clave estable de fila, no por posición,
+    así que sobrevive al scroll y a los cambios de orden.
+
+    claves: secuencia con la clave de cada fila (p. ej. etiquetas del índice del DataFrame).
+    textos: secuencia alineada con claves, o función clave -> texto.
+    """
+
+    def __init__(self, master, width=90, height=15, **kw):
+        super().__init__(master, **kw)
+        self._claves = []
+        self._textos = []
+        self._seleccion = set()
+        self._inicio = 0                # primera fila visible
+        self._visibles = height         # filas que entran en el Listbox
+
+        self.lista = Listbox(
+            self, selectmode="multiple", width=width, height=height,
+            activestyle="none", exportselection=False,
+        )
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.lista.pack(side="left", fill="both", expand=True)
+        self.scroll.pack(side="right", fill="y")
+
+        self._alto_linea = tkfont.Font(font=self.lista.cget("font")).metrics("linespace") + 1
+        self.lista.bind("<<ListboxSelect>>", self._on_select)
+        self.lista.bind("<Configure>", self._on_configure)
+        self.lista.bind("<MouseWheel>", lambda e: self.desplazar(int(-e.delta / 120) * 3))
+        self.lista.bind("<Button-4>", lambda e: self.desplazar(-3))
+        self.lista.bind("<Button-5>", lambda e: self.desplazar(3))
+        self.lista.bind("<Up>", lambda e: self.desplazar(-1))
+        self.lista.bind("<Down>", lambda e: self.desplazar(1))
+        self.lista.bind("<Prior>", lambda e: self.desplazar(-self._visibles))
+        self.lista.bind("<Next>", lambda e: self.desplazar(self._visibles))
+
+    # ---------- Datos ----------
+    def set_datos(self, claves, textos, conservar_seleccion=False):
+        """Cambia la fuente de datos. Tiempo constante: solo se renderizan las filas visibles."""
+        self._claves = claves
+        self._textos = textos
+        if not conservar_seleccion:
+            self._seleccion.clear()
+        self._inicio = 0
+        self._render()
+
+    def refrescar(self):
+        """Vuelve a dibujar tras modificar la fuente de datos (p. ej. una lista a la que se agregó algo)."""
+        self._inicio = max(0, min(self._inicio, len(self._claves) - self._visibles))
+        self._render()
+
+    def _texto(self, pos):
+        if callable(self._textos):
+            return self._textos(self._claves[pos])
+        return self._textos[pos]
+
+    # ---------- Selección ----------
+    def seleccion(self) -> list:
+        """Claves seleccionadas, en el orden de la lista."""
+        if not self._seleccion:
+            return []
+        return [c for c in self._claves if c in self._seleccion]
+
+    def seleccionar_todo(self):
+        self._seleccion.update(self._claves)
+        self._render()
+
+    def limpiar_seleccion(self):
+        self._seleccion.clear()
+        self._render()
+
+    def _on_select(self, event=None):
+        marcadas = set(self.lista.curselection())
+        fin = min(self._inicio + self._visibles, len(self._claves))
+        for i, pos in enumerate(range(self._inicio, fin)):
+            if i in marcadas:
+                self._seleccion.add(self._claves[pos])
+            else:
+                self._seleccion.discard(self._claves[pos])
+
+    # ---------- Scroll ----------
+    def desplazar(self, filas):
+        self._ir_a(self._inicio + filas)
+        return "break"
+
+    def _ir_a(self, inicio):
+        inicio = max(0, min(int(inicio), len(self._claves) - self._visibles))
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._render()
+
+    def _on_scroll(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            self._ir_a(float(cantidad) * len(self._claves))
+        elif accion == "scroll":
+            paso = self._visibles if unidad == "pages" else 1
+            self.desplazar(int(cantidad) * paso)
+
+    def _on_configure(self, event):
+        visibles = max(1, event.height // self._alto_linea)
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self.refrescar()
+
+    def _render(self):
+        total = len(self._claves)
+        fin = min(self._inicio + self._visibles, total)
+        self.lista.delete(0, END)
+        if fin > self._inicio:
+            self.lista.insert(END, *(self._texto(p) for p in range(self._inicio, fin)))
+            for i, pos in enumerate(range(self._inicio, fin)):
+                if self._claves[pos] in self._seleccion:
+                    self.lista.selection_set(i)
+        if total:
+            self.scroll.set(self._inicio / total, fin / total)
+        else:
+            self.scroll.set(0, 1)
+
+
+class GrillaEditable(ttk.Frame):
+    """
+    Grilla de dos columnas (texto fijo + valor editable) virtualizada: existe un grupo fijo de
+    Label + Entry por fila visible que se recicla al hacer scroll. Los valores viven en un dict
+    clave -> texto, así miles de filas no crean miles de widgets.
+
+    claves: secuencia de claves de fila; textos: función clave -> texto; valores: dict clave -> valor.
+    """
+
+    def __init__(self, master, claves, textos, valores, filas=16, ancho_texto=520, ancho_valor=18,
+                 titulo_texto="", titulo_valor="", **kw):
+        super().__init__(master, **kw)
+        self._claves = claves
+        self._textos = textos
+        self.valores = valores
+        self._inicio = 0
+        self._pintando = False
+
+        cuerpo = ttk.Frame(self)
+        cuerpo.pack(side="left", fill="both", expand=True)
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scroll.pack(side="right", fill="y")
+
+        ttk.Label(cuerpo, text=titulo_texto, font=("Arial", 10, "bold")).grid(
+            row=0, column=0, padx=8, pady=6, sticky="w"
+        )
+        ttk.Label(cuerpo, text=titulo_valor, font=("Arial", 10, "bold")).grid(
+            row=0, column=1, padx=8, pady=6, sticky="w"
+        )
+
+        # Pool fijo de widgets
+        self._slots = []
+        for i in range(filas):
+            var = StringVar()
+            lbl = ttk.Label(cuerpo, text="", width=ancho_texto // 7, anchor="w")
+            ent = ttk.Entry(cuerpo, width=ancho_valor, textvariable=var)
+            lbl.grid(row=i + 1, column=0, sticky="w", padx=8, pady=2)
+            ent.grid(row=i + 1, column=1, sticky="w", padx=8, pady=2)
+            var.trace_add("write", lambda *_, n=i: self._on_editar(n))
+            for w in (lbl, ent):
+                w.bind("<MouseWheel>", lambda e: self.desplazar(int(-e.delta / 120) * 3))
+                w.bind("<Button-4>", lambda e: self.desplazar(-3))
+                w.bind("<Button-5>", lambda e: self.desplazar(3))
+            self._slots.append((lbl, ent, var))
+
+        self._render()
+
+    def _on_editar(self, n):
+        if self._pintando:
+            return
+        pos = self._inicio + n
+        if pos < len(self._claves):
+            self.valores[self._claves[pos]] = self._slots[n][2].get()
+
+    def refrescar(self):
+        """Vuelve a dibujar tras cambiar valores desde fuera (acciones masivas)."""
+        self._render()
+
+    def desplazar(self, filas):
+        inicio = max(0, min(self._inicio + filas, len(self._claves) - len(self._slots)))
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._render()
+        return "break"
+
+    def _on_scroll(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            self.desplazar(int(float(cantidad) * len(self._claves)) - self._inicio)
+        elif accion == "scroll":
+            paso = len(self._slots) if unidad == "pages" else 1
+            self.desplazar(int(cantidad) * paso)
+
+    def _render(self):
+        total = len(self._claves)
+        self._pintando = True
+        try:
+            for n, (lbl, ent, var) in enumerate(self._slots):
+                pos = self._inicio + n
+                if pos < total:
+                    clave = self._claves[pos]
+                    lbl.config(text=self._textos(clave))
+                    var.set(self.valores.get(clave, ""))
+                    ent.state(["!disabled"])
+                else:
+                    lbl.config(text="")
+                    var.set("")
+                    ent.state(["disabled"])
+        finally:
+            self._pintando = False
+        if total:
+            self.scroll.set(self._inicio / total, min(self._inicio + len(self._slots), total) / total)
+        else:
+            self.scroll.set(0, 1)
+
+
+class TablaPaginada(ttk.Frame):
+    """
+    Treeview que pide filas a una consulta paginada (database.ConsultaPaginada) a medida que el usuario
+    se acerca al final del scroll. Clic en una cabecera ordena por esa columna en SQL (ORDER BY).
+    El iid de cada fila es su id en la BD.
+    """
+
+    def __init__(self, master, consulta, etiquetas, anchos=None, selectmode="extended", **kw):
+        super().__init__(master, **kw)
+        self.consulta = consulta
+        self.etiquetas = dict(zip(consulta.columnas, etiquetas))
+        self._cargando = False
+        self._desenganchados = set()    # iids quitados de la vista con desenganchar()
+
+        self.tree = ttk.Treeview(self, columns=consulta.columnas, show="headings", selectmode=selectmode)
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+        self.scroll.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        anchos = anchos or {}
+        for c in consulta.columnas:
+            self.tree.heading(c, text=self.etiquetas[c], command=lambda c=c: self.ordenar(c))
+            self.tree.column(c, width=anchos.get(c, 120), anchor="w")
+
+    def _on_yscroll(self, first, last):
+        self.scroll.set(first, last)
+        if float(last) >= 0.95 and not self.consulta.agotada and not self._cargando:
+            self.after_idle(self.cargar_mas)
+
+    def cargar_mas(self):
+        if self._cargando or self.consulta.agotada:
+            return
+        self._cargando = True
+        try:
+            for fila in self.consulta.siguiente():
+                self.tree.insert("", END, iid=str(fila[0]), values=fila)
+        finally:
+            self._cargando = False
+
+    def recargar(self):
+        """Vacía la tabla y vuelve a pedir desde la primera página (tras ordenar o filtrar)."""
+        hijos = self.tree.get_children()
+        if hijos:
+            self.tree.delete(*hijos)
+        if self._desenganchados:
+            self.tree.delete(*self._desenganchados)
+            self._desenganchados.clear()
+        self.consulta.reiniciar()
+        self._pintar_cabeceras()
+        self.cargar_mas()
+
+    def ordenar(self, columna):
+        self.consulta.ordenar(columna)
+        self.recargar()
+
+    def _pintar_cabeceras(self):
+        for c, texto in self.etiquetas.items():
+            if c == self.consulta.orden:
+                texto += " ▼" if self.consulta.descendente else " ▲"
+            self.tree.heading(c, text=texto)
+
+    def seleccion_ids(self) -> list:
+        return [int(iid) for iid in self.tree.selection()]
+
+    def desenganchar(self, iids) -> list:
+        """Quita filas de la vista en una sola llamada. Devuelve [(iid, posición)] para reenganchar()."""
+        posiciones = {iid: i for i, iid in enumerate(self.tree.get_children())}
+        items = sorted(((iid, posiciones[iid]) for iid in iids if iid in posiciones), key=lambda x: x[1])
+        self.tree.detach(*iids)
+        self._desenganchados.update(iids)
+        return items
+
+    def reenganchar(self, items) -> bool:
+        """Devuelve las filas a su posición. False si la tabla se recargó entretanto (no hay qué reenganchar)."""
+        if not all(iid in self._desenganchados for iid, _ in items):
+            return False
+        for iid, pos in items:          # En orden creciente de posición, cada fila vuelve a su lugar
+            self.tree.move(iid, "", pos)
+            self._desenganchados.discard(iid)
+        return True
+
+
+class TablaMarcable(ttk.Frame):
+    """
+    Tabla virtualizada con una columna de marca (☑/☐): un Treeview con un grupo fijo de filas que se
+    reciclan al hacer scroll, así el costo de abrir y desplazarse no depende del total de registros.
+    Las marcas viven en un set de claves (self.marcados); clic o barra espaciadora alternan la fila.
+
+    claves: secuencia de claves de fila (p. ej. ids de la BD); valores: función clave -> tupla de columnas.
+    al_cambiar(clave, marcado): opcional, se llama tras cada cambio de marca hecho por el usuario.
+    al_final(): opcional, se llama cuando la vista llega cerca del final de claves (para pedir otra página
+    y extender la lista en el lugar).
+    """
+
+    MARCA = ("☐", "☑")
+
+    def __init__(self, master, columnas, etiquetas, anchos=None, filas=20, al_cambiar=None, al_final=None, **kw):
+        super().__init__(master, **kw)
+        self._claves = []
+        self._valores = lambda clave: ()
+        self.marcados = set()
+        self.al_cambiar = al_cambiar
+        self.al_final = al_final
+        self._pidiendo = False
+        self._inicio = 0
+        self._visibles = filas
+
+        cols = ("marca",) + tuple(columnas)
+        self.tree = ttk.Treeview(self, columns=cols, show="headings", selectmode="browse", height=filas)
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scroll.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        anchos = anchos or {}
+        self.tree.heading("marca", text="✔")
+        self.tree.column("marca", width=36, anchor="center", stretch=False)
+        for c, texto in zip(columnas, etiquetas):
+            self.tree.heading(c, text=texto)
+            self.tree.column(c, width=anchos.get(c, 110), anchor="w")
+
+        alto = ttk.Style().lookup("Treeview", "rowheight")
+        self._alto_fila = int(alto) if alto else tkfont.nametofont("TkDefaultFont").metrics("linespace") + 4
+        self._crear_pool(filas)
+
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<space>", self._on_espacio)
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<MouseWheel>", lambda e: self.desplazar(int(-e.delta / 120) * 3))
+        self.tree.bind("<Button-4>", lambda e: self.desplazar(-3))
+        self.tree.bind("<Button-5>", lambda e: self.desplazar(3))
+        self.tree.bind("<Prior>", lambda e: self.desplazar(-self._visibles))
+        self.tree.bind("<Next>", lambda e: self.desplazar(self._visibles))
+        self.tree.bind("<Up>", lambda e: self.desplazar(-1))
+        self.tree.bind("<Down>", lambda e: self.desplazar(1))
+
+    def _crear_pool(self, filas):
+        hijos = self.tree.get_children()
+        if hijos:
+            self.tree.delete(*hijos)
+        for n in range(filas):
+            self.tree.insert("", END, iid=str(n), values=())
+
+    # ---------- Datos ----------
+    def set_datos(self, claves, valores, marcados=None):
+        """Cambia la fuente de datos; marcados: claves marcadas al inicio (se copia en un set)."""
+        self._claves = claves
+        self._valores = valores
+        self.marcados = set(marcados or ())
+        self._inicio = 0
+        self._render()
+
+    def refrescar(self):
+        """Vuelve a dibujar tras cambiar la fuente de datos o las marcas desde fuera."""
+        self._inicio = max(0, min(self._inicio, len(self._claves) - self._visibles))
+        self._render()
+
+    # ---------- Marcas ----------
+    def alternar(self, clave):
+        if clave in self.marcados:
+            self.marcados.discard(clave)
+        else:
+            self.marcados.add(clave)
+        self._render()
+        if self.al_cambiar is not None:
+            self.al_cambiar(clave, clave in self.marcados)
+
+    def _clave_de_fila(self, iid):
+        pos = self._inicio + int(iid)
+        return self._claves[pos] if pos < len(self._claves) else None
+
+    def _on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) != "cell":
+            return None
+        iid = self.tree.identify_row(event.y)
+        clave = self._clave_de_fila(iid) if iid else None
+        if clave is not None:
+            self.tree.selection_set(iid)
+            self.tree.focus(iid)
+            self.alternar(clave)
+        return "break"
+
+    def _on_espacio(self, event):
+        iid = self.tree.focus()
+        clave = self._clave_de_fila(iid) if iid else None
+        if clave is not None:
+            self.alternar(clave)
+        return "break"
+
+    # ---------- Scroll ----------
+    def desplazar(self, filas):
+        inicio = max(0, min(self._inicio + filas, len(self._claves) - self._visibles))
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._render()
+        return "break"
+
+    def _on_scroll(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            self.desplazar(int(float(cantidad) * len(self._claves)) - self._inicio)
+        elif accion == "scroll":
+            paso = self._visibles if unidad == "pages" else 1
+            self.desplazar(int(cantidad) * paso)
+
+    def _on_configure(self, event):
+        visibles = max(1, (event.height - self._alto_fila) // self._alto_fila)   # Menos la cabecera
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self._crear_pool(visibles)
+            self.refrescar()
+
+    def _render(self):
+        total = len(self._claves)
+        for n in range(self._visibles):
+            pos = self._inicio + n
+            if pos < total:
+                clave = self._claves[pos]
+                self.tree.item(str(n), values=(self.MARCA[clave in self.marcados],) + tuple(self._valores(clave)))
+            else:
+                self.tree.item(str(n), values=())
+        if total:
+            self.scroll.set(self._inicio / total, min(self._inicio + self._visibles, total) / total)
+        else:
+            self.scroll.set(0, 1)
+        if self.al_final is not None and not self._pidiendo and self._inicio + 2 * self._visibles >= total:
+            self._pidiendo = True
+            self.after_idle(self._pedir_mas)
+
+    def _pedir_mas(self):
+        try:
+            self.al_final()
+        finally:
+            self._pidiendo = False